@@ -1,18 +1,50 @@
 import os
-from dotenv import load_dotenv
 import streamlit as st
-from neo4j import GraphDatabase
+import pandas as pd
 from streamlit_agraph import agraph, Node, Edge, Config
 import textwrap
+import functools
+import threading
+import time
+import json
+import collections
+import contextlib
+from todo_db import (
+    CHANGE_TIMESTAMP_PROPERTIES, COMPACT_SNAPSHOT_DIR, DELETED_CONFLICT, FILTER_MAX_DEPTH, GRAPH_LOAD_DEPTH,
+    REL_TO_LABEL_MAP, SEARCH_INDEX_NAME, TASK_STATUSES, TODO_LABELS, TREE_RELATIONSHIPS, TREE_REL_PATTERN,
+    create_driver, read_query, ensure_schema, run_cypher_script, fetch_graph_data, fetch_subtree, fetch_children,
+    tree_record, filtered_graph_query, fetch_graph_version, fulltext_query, fetch_neighbourhood,
+    create_database_snapshot, update_node_properties, create_node_and_relationship, set_subtree_status,
+    delete_subtrees, move_subtrees, flush_edits, create_compact_snapshot, restore_compact_snapshot, import_tasks,
+)
 
 NODE_COLOR_MAP = {
     "Start_Node": "#FFEF00", # Light Yellow for Start Node
     "Task_Category": "#C6A4FF",  # A reddish color Task_Category
     "Task": "#88E788", # A purple color for Task
     "SubTask": "#90D5FF",   # A teal color for SubTask
+    "_Summary": "#E0E0E0", # A light grey for collapsed subtree summaries
     # Add other labels from your graph here
 }
 DEFAULT_NODE_COLOR = "#B2B2B2" # A neutral default color for other node types
+LAYOUT_NODE_SPACING = 90 # Horizontal distance between neighbouring nodes in the precomputed layout
+LAYOUT_LEVEL_SPACING = 150 # Vertical distance between tree levels in the precomputed layout
+LAYOUT_KEEP_SHARE = 0.5 # Previous positions are kept only if they cover at least this share of the nodes drawn
+COLLAPSE_DEPTH = 3 # Subtrees below this depth are drawn as one summary node in collapse mode
+COLLAPSE_THRESHOLD = 25 # Nodes with more children than this are drawn collapsed in collapse mode
+SUMMARY_NODE_PREFIX = "summary:" # Summary node id = prefix + id of the collapsed node
+SUMMARY_LABEL = "_Summary"
+SUMMARY_REL_TYPE = "HIDDEN_SUBTREE"
+HIGHLIGHT_BORDER_COLOR = "#D62828" # Border of nodes picked for a bulk edit
+WIDGET_CACHE_SIZE = 20000 # Prebuilt agraph Node/Edge objects kept across reruns
+GRAPH_POLL_INTERVAL = 5 # Seconds between checks of the graph version while the graph is shown
+WRITE_BEHIND_FLUSH_INTERVAL = 30 # Seconds queued edits wait before the write-behind timer flushes them
+SEARCH_RESULT_LIMIT = 10
+SEARCH_CACHE_TTL = 30 # Seconds a search result is reused while the user types
+PROFILE_MAX_QUERIES = 2000 # Query timings kept per session by the profiler
+PROFILE_MAX_RERUNS = 200 # Reruns whose phase timings are kept per session
+PROFILE_QUERY_TEXT_LENGTH = 120 # Characters of query text kept in profiles and metric labels
+PROFILING_ENV_VAR = "TODO_APP_PROFILING" # Set to 1/true in .env to start every session with profiling on
 # START_NODE_NAME = "GenAI ToDo"
 
 ##================== Neo4j Connection ======================
@@ -25,189 +57,875 @@ def wrap_text(text, width=9):
 # Use Streamlit's caching to store the driver instance
 @st.cache_resource
 def get_driver():
-    """Creates a Neo4j driver instance."""
-    load_dotenv()
-    uri = os.getenv("NEO4J_URI")
-    user = os.getenv("NEO4J_USERNAME")
-    password = os.getenv("NEO4J_PASSWORD")
-    return GraphDatabase.driver(uri, auth=(user, password), max_connection_lifetime=3600)
-
-##TODO: Debug & test this function with actual .cql file
-def run_cypher_script(driver, file_path):
-    """Reads a .cql file and executes the Cypher queries against the database."""
-    with driver.session() as session:
+    """One driver per server process, shared by every session."""
+    return create_driver()
+
+@st.cache_resource
+def bootstrap_schema(_driver):
+    """Runs ensure_schema once per server process."""
+    return ensure_schema(_driver)
+
+##================== Query Profiling ======================
+
+def query_fingerprint(query):
+    """Collapses whitespace and truncates a query so it can be used as a metric label."""
+    return " ".join(query.split())[:PROFILE_QUERY_TEXT_LENGTH]
+
+def parameters_size(parameters):
+    """Approximate size in bytes of the parameters sent with a query."""
+    if not parameters:
+        return 0
+    return len(json.dumps(parameters, default=str))
+
+class QueryProfiler:
+    """
+    Per-session record of every query run through a ProfiledDriver and of the time spent in
+    each phase of main(). Each main() run is one rerun; older entries fall off the end.
+    """
+
+    def __init__(self):
+        self.queries = collections.deque(maxlen=PROFILE_MAX_QUERIES)
+        self.reruns = collections.deque(maxlen=PROFILE_MAX_RERUNS)
+        self.rerun_count = 0
+
+    def start_rerun(self):
+        self.rerun_count += 1
+        self.reruns.append({"rerun": self.rerun_count, "started_at": time.time(), "phases": []})
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Times the enclosed block; st.rerun()/st.stop() end the phase with outcome "rerun"."""
+        start = time.perf_counter()
+        outcome = "ok"
         try:
-            with open(file_path, 'r') as f:
-                cql_script = f.read()
-                # Split script into individual statements, removing empty ones
-                queries = [q.strip() for q in cql_script.split(';') if q.strip()]
-                
-                for query in queries:
-                    if query: # Ensure not to run empty queries
-                        session.run(query)
-            return True, "Script executed successfully."
-        except FileNotFoundError:
-            return False, f"Error: The file {file_path} was not found."
-        except Exception as e:
-            return False, f"An error occurred: {e}"
-        
-# Use Streamlit's data caching for the query results
-@st.cache_data(ttl=3600) # Cache data for 1 hour
-def fetch_graph_data(_driver):
-    """Fetches all nodes and relationships from the graph."""
-    with _driver.session() as session:
-        # This query fetches nodes and the relationships between them
-        # We limit to 100 to avoid overwhelming the browser with a very large graph
-        result = session.run("MATCH (n)-[r]->(m) RETURN n, r, m LIMIT 100")
-        # Process data into a simple list of dicts before returning
-        processed_data = []
-        for record in result:
-            source_node = record['n']
-            target_node = record['m']
-            relationship = record['r']
-            
-            processed_data.append({
-                "source": {"id": source_node.element_id, "labels": list(source_node.labels), "properties": dict(source_node)},
-                "target": {"id": target_node.element_id, "labels": list(target_node.labels), "properties": dict(target_node)},
-                "relationship": {"type": relationship.type}
-            })
-        return processed_data
+            yield
+        except BaseException as e:
+            # Streamlit's script control exceptions do not derive from Exception
+            outcome = "error" if isinstance(e, Exception) else "rerun"
+            raise
+        finally:
+            if self.reruns:
+                self.reruns[-1]["phases"].append({
+                    "phase": name, "seconds": time.perf_counter() - start, "outcome": outcome})
+
+    def record_query(self, entry):
+        entry["rerun"] = self.rerun_count
+        self.queries.append(entry)
+
+    def last_completed_rerun(self):
+        """The newest rerun that has finished at least one phase, or None."""
+        for rerun in reversed(self.reruns):
+            if rerun["phases"]:
+                return rerun
+        return None
+
+    def to_jsonl(self):
+        """One JSON object per query and per phase, oldest first."""
+        lines = [json.dumps({"type": "query", **entry}, default=str) for entry in self.queries]
+        for rerun in self.reruns:
+            lines.extend(json.dumps({"type": "phase", "rerun": rerun["rerun"],
+                                     "started_at": rerun["started_at"], **phase})
+                         for phase in rerun["phases"])
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def to_prometheus(self):
+        """Aggregated query and phase timings in the Prometheus text exposition format."""
+        def escape(value):
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        queries = {}
+        for entry in self.queries:
+            stats = queries.setdefault(entry["query"], [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += entry["wall_ms"] / 1000
+            stats[2] += entry["client_ms"] / 1000
+            stats[3] += entry["rows"]
+        phases = {}
+        for rerun in self.reruns:
+            for phase in rerun["phases"]:
+                stats = phases.setdefault(phase["phase"], [0, 0.0])
+                stats[0] += 1
+                stats[1] += phase["seconds"]
+
+        lines = [
+            "# HELP todo_app_query_duration_seconds Wall time from session.run until the result was consumed.",
+            "# TYPE todo_app_query_duration_seconds summary",
+        ]
+        for query, (count, wall, _, _) in queries.items():
+            lines.append(f'todo_app_query_duration_seconds_sum{{query="{escape(query)}"}} {wall:.6f}')
+            lines.append(f'todo_app_query_duration_seconds_count{{query="{escape(query)}"}} {count}')
+        lines += ["# HELP todo_app_query_client_seconds_total Time spent processing results in the app.",
+                  "# TYPE todo_app_query_client_seconds_total counter"]
+        lines += [f'todo_app_query_client_seconds_total{{query="{escape(query)}"}} {client:.6f}'
+                  for query, (_, _, client, _) in queries.items()]
+        lines += ["# HELP todo_app_query_rows_total Rows returned to the app.",
+                  "# TYPE todo_app_query_rows_total counter"]
+        lines += [f'todo_app_query_rows_total{{query="{escape(query)}"}} {rows}'
+                  for query, (_, _, _, rows) in queries.items()]
+        lines += ["# HELP todo_app_phase_duration_seconds Time spent in each phase of a rerun.",
+                  "# TYPE todo_app_phase_duration_seconds summary"]
+        for phase, (count, seconds) in phases.items():
+            lines.append(f'todo_app_phase_duration_seconds_sum{{phase="{escape(phase)}"}} {seconds:.6f}')
+            lines.append(f'todo_app_phase_duration_seconds_count{{phase="{escape(phase)}"}} {count}')
+        lines += ["# HELP todo_app_reruns_total Script runs profiled in this session.",
+                  "# TYPE todo_app_reruns_total counter",
+                  f"todo_app_reruns_total {self.rerun_count}"]
+        return "\n".join(lines) + "\n"
+
+class ProfiledResult:
+    """Wraps a neo4j Result, counting rows and recording timings once it is consumed."""
+
+    def __init__(self, result, profiler, query, parameters, started, returned):
+        self._result = result
+        self._profiler = profiler
+        self._query = query
+        self._parameters = parameters
+        self._started = started
+        self._returned = returned
+        self._rows = 0
+        self._finished = False
+
+    def __iter__(self):
+        for record in self._result:
+            self._rows += 1
+            yield record
+        self.finish()
+
+    def single(self, *args, **kwargs):
+        record = self._result.single(*args, **kwargs)
+        self._rows += record is not None
+        self.finish()
+        return record
+
+    def data(self, *args, **kwargs):
+        rows = self._result.data(*args, **kwargs)
+        self._rows += len(rows)
+        self.finish()
+        return rows
+
+    def consume(self):
+        summary = self._result.consume()
+        self.finish(summary)
+        return summary
+
+    def finish(self, summary=None):
+        """Records the query once; called when the result is exhausted or its session closes."""
+        if self._finished:
+            return
+        self._finished = True
+        wall_ms = (time.perf_counter() - self._started) * 1000
+        if summary is None:
+            try:
+                summary = self._result.consume()
+            except Exception:
+                summary = None
+        available_ms = getattr(summary, "result_available_after", None)
+        consumed_ms = getattr(summary, "result_consumed_after", None)
+        server_ms = (available_ms or 0) + (consumed_ms or 0)
+        self._profiler.record_query({
+            "query": query_fingerprint(self._query),
+            "parameters_bytes": parameters_size(self._parameters),
+            "rows": self._rows,
+            "server_available_ms": available_ms,
+            "server_consumed_ms": consumed_ms,
+            "run_ms": (self._returned - self._started) * 1000,
+            "wall_ms": wall_ms,
+            # What is left once the server's share is taken out: network and result processing
+            "client_ms": max(wall_ms - server_ms, 0.0),
+            "at": time.time(),
+        })
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+class _ProfiledRunner:
+    """Shared run() for profiled sessions and transactions."""
+
+    def __init__(self, target, profiler):
+        self._target = target
+        self._profiler = profiler
+        self._open_results = []
+
+    def run(self, query, parameters=None, **kwargs):
+        started = time.perf_counter()
+        result = self._target.run(query, parameters, **kwargs)
+        profiled = ProfiledResult(result, self._profiler, query, {**(parameters or {}), **kwargs},
+                                  started, time.perf_counter())
+        self._open_results.append(profiled)
+        return profiled
+
+    def _finish_open_results(self):
+        for result in self._open_results:
+            result.finish()
+        self._open_results = []
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+class ProfiledTransaction(_ProfiledRunner):
+    def commit(self):
+        self._finish_open_results()
+        return self._target.commit()
+
+    def rollback(self):
+        self._finish_open_results()
+        return self._target.rollback()
+
+    def close(self):
+        self._finish_open_results()
+        return self._target.close()
+
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._finish_open_results()
+        return self._target.__exit__(*exc_info)
+
+class ProfiledSession(_ProfiledRunner):
+    def begin_transaction(self, *args, **kwargs):
+        return ProfiledTransaction(self._target.begin_transaction(*args, **kwargs), self._profiler)
+
+    def execute_read(self, transaction_function, *args, **kwargs):
+        return self._target.execute_read(self._profiled_function(transaction_function), *args, **kwargs)
+
+    def execute_write(self, transaction_function, *args, **kwargs):
+        return self._target.execute_write(self._profiled_function(transaction_function), *args, **kwargs)
+
+    def _profiled_function(self, transaction_function):
+        """Hands the managed transaction to transaction_function with its run() profiled; each retry is recorded."""
+        def run(tx, *args, **kwargs):
+            profiled_tx = _ProfiledRunner(tx, self._profiler)
+            try:
+                return transaction_function(profiled_tx, *args, **kwargs)
+            finally:
+                profiled_tx._finish_open_results()
+        return run
+
+    def close(self):
+        self._finish_open_results()
+        return self._target.close()
+
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._finish_open_results()
+        return self._target.__exit__(*exc_info)
+
+class ProfiledDriver:
+    """
+    Stand-in for the shared driver that reports to one session's profiler. It is cheap to
+    build, so main() wraps the cached driver on each rerun while profiling is on.
+    """
+
+    def __init__(self, driver, profiler):
+        self._driver = driver
+        self._profiler = profiler
+
+    def session(self, *args, **kwargs):
+        return ProfiledSession(self._driver.session(*args, **kwargs), self._profiler)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+def get_session_profiler():
+    """The current browser session's profiler, or None when profiling is off."""
+    if 'profiling' not in st.session_state:
+        st.session_state.profiling = os.getenv(PROFILING_ENV_VAR, "").lower() in ("1", "true", "yes")
+    if not st.session_state.profiling:
+        return None
+    if 'profiler' not in st.session_state:
+        st.session_state.profiler = QueryProfiler()
+    return st.session_state.profiler
+
+def profile_phase(profiler, name):
+    """profiler.phase(name), or a no-op when profiling is off."""
+    return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+@st.cache_data(max_entries=64)
+def fetch_filtered_graph(_driver, statuses=(), labels=(), category=None, max_depth=FILTER_MAX_DEPTH, graph_version=None):
+    """
+    Fetches the paths from the Start_Node to every node matching the filters, at most
+    max_depth levels down. Empty filters match everything.
+    """
+    query = filtered_graph_query(statuses, labels, category, max_depth)
+    result = read_query(_driver, query, statuses=list(statuses), labels=list(labels),
+                        category=category, max_depth=max(int(max_depth), 1))
+    return [tree_record(record) for record in result]
+
+@st.cache_data(max_entries=16)
+def fetch_category_names(_driver, graph_version):
+    """Names of every Task_Category, for the root category filter."""
+    return [record['name'] for record in
+            read_query(_driver, "MATCH (c:Task_Category) RETURN c.name AS name ORDER BY name")]
+
+##================== Graph Cache ======================
+
+class GraphCache:
+    """
+    Processed nodes and edges from fetch_graph_data / fetch_subtree, shared by all sessions.
+    The app's own writes are applied as deltas; a full reload only happens when the
+    database version marker moves in a way the cache has not seen.
+    In "progressive" mode the cache holds the first load_depth levels plus the children
+    of every node expanded so far, and each session picks its own view with view().
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = None
+        self.nodes = {} # node id -> {"id", "labels", "properties"}
+        self.edges = {} # (source id, target id, type) -> processed record
+        self.incident = {} # node id -> set of edge keys touching it
+        self.dirty = set() # node ids whose records must be rebuilt
+        self.mode = "full"
+        self.load_depth = None
+        self.children_loaded = set() # node ids whose complete child list is cached (progressive mode)
+        self.generation = 0 # bumped on every change so unchanged views can be handed out again
+        self._views = {} # (generation, expanded) -> records list
+
+    def is_current(self, version, mode="full", load_depth=None):
+        return (version is not None and self.version == version
+                and self.mode == mode and self.load_depth == load_depth)
+
+    def invalidate(self):
+        with self._lock:
+            self.version = None
+
+    def replace(self, records, version, mode="full", load_depth=None):
+        """Replaces the whole cache with freshly fetched records."""
+        with self._lock:
+            self.nodes, self.edges, self.incident, self.dirty = {}, {}, {}, set()
+            for record in records:
+                self._add_edge(record['source'], record['target'], record['relationship']['type'])
+            self.version, self.mode, self.load_depth = version, mode, load_depth
+            self.children_loaded = set()
+            self.generation += 1
+            if mode == "progressive":
+                # Everything above the last fetched level has its complete child list
+                for node_id, depth in self._depths(self.root_ids(), expanded=()).items():
+                    if depth < load_depth:
+                        self.children_loaded.add(node_id)
+
+    def merge_children(self, node_ids, records, version):
+        """Adds freshly fetched children of `node_ids`, provided they were read at the cached version."""
+        with self._lock:
+            if not self.is_current(version, self.mode, self.load_depth):
+                return False
+            for record in records:
+                self._add_edge(record['source'], record['target'], record['relationship']['type'])
+            self.children_loaded.update(node_ids)
+            self.generation += 1
+            return True
+
+    def root_ids(self):
+        return [node_id for node_id, node in self.nodes.items() if "Start_Node" in node['labels']]
+
+    def _child_keys(self, node_id):
+        return sorted(key for key in self.incident.get(node_id, ()) if key[0] == node_id and key[2] in TREE_RELATIONSHIPS)
+
+    def _depths(self, root_ids, expanded):
+        """Breadth-first depths of the nodes visible from root_ids, following children of shallow or expanded nodes."""
+        depths = {root_id: 0 for root_id in root_ids}
+        frontier = list(root_ids)
+        while frontier:
+            next_frontier = []
+            for node_id in frontier:
+                if depths[node_id] >= self.load_depth and node_id not in expanded:
+                    continue
+                for key in self._child_keys(node_id):
+                    if key[1] not in depths:
+                        depths[key[1]] = depths[node_id] + 1
+                        next_frontier.append(key[1])
+            frontier = next_frontier
+        return depths
+
+    def _add_edge(self, source, target, rel_type):
+        source = self.nodes.setdefault(source['id'], source)
+        target = self.nodes.setdefault(target['id'], target)
+        key = (source['id'], target['id'], rel_type)
+        self.edges[key] = {"source": source, "target": target, "relationship": {"type": rel_type}}
+        self.incident.setdefault(source['id'], set()).add(key)
+        self.incident.setdefault(target['id'], set()).add(key)
+
+    def _advance(self, previous_version, version):
+        """Moves to `version` if the delta directly follows the cached state, otherwise marks the cache stale."""
+        if self.version is not None and self.version == previous_version:
+            self.version = version
+            self.generation += 1
+            return True
+        self.version = None
+        return False
+
+    def apply_update(self, node_id, properties, previous_version, version):
+        self.apply_updates({node_id: properties}, previous_version, version)
+
+    def apply_updates(self, properties_by_id, previous_version, version):
+        """Replaces the properties of several nodes written by one statement."""
+        with self._lock:
+            if not self._advance(previous_version, version):
+                return
+            for node_id, properties in properties_by_id.items():
+                node = self.nodes.get(node_id)
+                if node is not None:
+                    self.nodes[node_id] = {"id": node_id, "labels": node['labels'], "properties": dict(properties)}
+                    self.dirty.add(node_id)
+
+    def apply_status(self, node_ids, status, previous_version, version):
+        with self._lock:
+            if not self._advance(previous_version, version):
+                return
+            for node_id in node_ids:
+                node = self.nodes.get(node_id)
+                if node is not None:
+                    self.nodes[node_id] = {"id": node_id, "labels": node['labels'],
+                                           "properties": {**node['properties'], "status": status}}
+                    self.dirty.add(node_id)
+
+    def apply_delete(self, node_ids, previous_version, version):
+        with self._lock:
+            if not self._advance(previous_version, version):
+                return
+            for node_id in node_ids:
+                self._remove_node(node_id)
+
+    def _remove_node(self, node_id):
+        self.nodes.pop(node_id, None)
+        self.children_loaded.discard(node_id)
+        self.dirty.discard(node_id)
+        for key in self.incident.pop(node_id, set()):
+            self.edges.pop(key, None)
+            for other_id in key[:2]:
+                if other_id != node_id and other_id in self.incident:
+                    self.incident[other_id].discard(key)
+                    if not self.incident[other_id]:
+                        # Nodes left without edges are not part of any record any more
+                        del self.incident[other_id]
+                        self.nodes.pop(other_id, None)
+                        self.children_loaded.discard(other_id)
+                        self.dirty.discard(other_id)
+
+    def apply_create(self, parent_id, node, rel_type, previous_version, version):
+        with self._lock:
+            if not self._advance(previous_version, version) or parent_id not in self.nodes:
+                return
+            self._add_edge(self.nodes[parent_id], node, rel_type)
+
+    def _rebuild_dirty(self):
+        """Rebuilds only the records that touch dirty nodes."""
+        for node_id in self.dirty:
+            for key in self.incident.get(node_id, ()):
+                source_id, target_id, rel_type = key
+                self.edges[key] = {"source": self.nodes[source_id], "target": self.nodes[target_id],
+                                   "relationship": {"type": rel_type}}
+        self.dirty.clear()
+
+    def records(self):
+        """Returns every cached record."""
+        with self._lock:
+            self._rebuild_dirty()
+            return list(self.edges.values())
+
+    def view(self, expanded=()):
+        """
+        Returns the records a session should draw. In progressive mode that is the tree down to
+        load_depth plus the children of the `expanded` node ids.
+        While the cache is unchanged the same list object is returned for the same `expanded`.
+        """
+        with self._lock:
+            view_key = (self.generation, frozenset(expanded))
+            if view_key in self._views:
+                return self._views[view_key]
+            self._rebuild_dirty()
+            if self.mode != "progressive":
+                records = list(self.edges.values())
+            else:
+                depths = self._depths(self.root_ids(), expanded)
+                records = [self.edges[key] for node_id in depths
+                           if depths[node_id] < self.load_depth or node_id in expanded
+                           for key in self._child_keys(node_id)]
+            self._views = {key: value for key, value in self._views.items() if key[0] == self.generation}
+            self._views[view_key] = records
+            return records
+
+def graph_load_mode(progressive=True, depth=GRAPH_LOAD_DEPTH):
+    """The (mode, load_depth) pair a GraphCache is filled for."""
+    return ("progressive", depth) if progressive else ("full", None)
+
+@st.cache_resource
+def get_graph_cache(mode, load_depth):
+    """One GraphCache per server process and load mode, shared by the sessions using that mode."""
+    return GraphCache()
+
+def session_graph_cache():
+    """The shared GraphCache matching this session's Progressive loading toggle."""
+    return get_graph_cache(*graph_load_mode(st.session_state.get('progressive_loading', True)))
+
+def load_graph_records(_driver, graph_cache, progressive=True, depth=GRAPH_LOAD_DEPTH, expanded=(), version=None):
+    """
+    Returns the cached graph, doing a full fetch only when the database version has moved.
+    In progressive mode only the first `depth` levels are fetched, and the children of
+    `expanded` nodes are fetched once and merged into the cache. `version` is the graph
+    version already read this rerun; it is read here when not given.
+    """
+    mode, load_depth = graph_load_mode(progressive, depth)
+    if version is None:
+        version = fetch_graph_version(_driver)
+    if not graph_cache.is_current(version, mode, load_depth):
+        records = fetch_subtree(_driver, depth) if progressive else fetch_graph_data(_driver)
+        graph_cache.replace(records, version, mode, load_depth)
+    if progressive:
+        missing = [node_id for node_id in expanded
+                   if node_id in graph_cache.nodes and node_id not in graph_cache.children_loaded]
+        if missing:
+            graph_cache.merge_children(missing, fetch_children(_driver, missing), version)
+    return graph_cache.view(expanded)
+
+@st.fragment(run_every=GRAPH_POLL_INTERVAL)
+def watch_graph_version(driver, drawn_version):
+    """
+    Re-runs on its own every GRAPH_POLL_INTERVAL seconds and reads only the version marker.
+    Once another session has written, the whole app reruns and picks up the change.
+    """
+    if time.time() - st.session_state.get('graph_version_read_at', 0) < GRAPH_POLL_INTERVAL / 2:
+        return # The full run that drew the graph has just read the version
+    if fetch_graph_version(driver) != drawn_version:
+        st.rerun(scope="app")
+
+##================== Subtree Roll-up ======================
+
+@st.cache_data(max_entries=64)
+def fetch_subtree_counts(_driver, node_ids, graph_version):
+    """
+    Counts the descendants of each node per status in one aggregating query.
+    Returns {node_id: {status: count}} for nodes with at least one descendant.
+    """
+    result = read_query(_driver, f"UNWIND $node_ids AS node_id "
+                                 f"MATCH (root) WHERE elementId(root) = node_id "
+                                 f"MATCH (root)-[:{TREE_REL_PATTERN}*1..]->(d) "
+                                 f"WITH node_id, d.status AS status, count(DISTINCT d) AS descendants "
+                                 f"RETURN node_id, collect([coalesce(status, 'Unknown'), descendants]) AS counts",
+                        node_ids=list(node_ids))
+    return {record['node_id']: dict(record['counts']) for record in result}
+
+def collapse_records(processed_records, expanded=(), collapse_depth=COLLAPSE_DEPTH, collapse_threshold=COLLAPSE_THRESHOLD):
+    """
+    Cuts the view at every node that is deeper than collapse_depth or has more than
+    collapse_threshold children, unless the node is in `expanded`.
+    Returns (kept_records, candidate_ids): candidates are the cut nodes plus the visible leaves,
+    i.e. every node that may have descendants that are not drawn.
+    """
+    children = {}
+    has_parent = set()
+    for record in processed_records:
+        source_id, target_id = record['source']['id'], record['target']['id']
+        children.setdefault(source_id, []).append(record)
+        children.setdefault(target_id, [])
+        has_parent.add(target_id)
+
+    kept_records = []
+    candidate_ids = []
+    depths = {node_id: 0 for node_id in children if node_id not in has_parent}
+    frontier = list(depths)
+    while frontier:
+        next_frontier = []
+        for node_id in frontier:
+            child_records = children[node_id]
+            collapsed = node_id not in expanded and (
+                depths[node_id] >= collapse_depth or len(child_records) > collapse_threshold)
+            if collapsed or not child_records:
+                candidate_ids.append(node_id)
+            if collapsed:
+                continue
+            for record in child_records:
+                kept_records.append(record)
+                target_id = record['target']['id']
+                if target_id not in depths:
+                    depths[target_id] = depths[node_id] + 1
+                    next_frontier.append(target_id)
+        frontier = next_frontier
+    return kept_records, candidate_ids
+
+def summary_record(parent_data, status_counts):
+    """A record linking a node to the summary node that stands in for its hidden subtree."""
+    total = sum(status_counts.values())
+    breakdown = " ".join(f"{status[0]}:{count}" for status, count in sorted(status_counts.items()))
+    return {
+        "source": parent_data,
+        "target": {"id": SUMMARY_NODE_PREFIX + parent_data['id'], "labels": [SUMMARY_LABEL],
+                   "properties": {"name": f"+{total} {breakdown}", **status_counts}},
+        "relationship": {"type": SUMMARY_REL_TYPE}
+    }
+
+def rollup_records(_driver, processed_records, graph_version, expanded=(),
+                   collapse_depth=COLLAPSE_DEPTH, collapse_threshold=COLLAPSE_THRESHOLD):
+    """Replaces hidden subtrees with summary nodes carrying per-status descendant counts."""
+    kept_records, candidate_ids = collapse_records(processed_records, expanded, collapse_depth, collapse_threshold)
+    counts = fetch_subtree_counts(_driver, tuple(sorted(candidate_ids)), graph_version) if candidate_ids else {}
+    node_data = {}
+    for record in processed_records:
+        node_data[record['source']['id']] = record['source']
+        node_data[record['target']['id']] = record['target']
+    # Leaves of the view whose children were never fetched also get a summary for their subtree
+    return kept_records + [summary_record(node_data[node_id], counts[node_id])
+                           for node_id in candidate_ids if counts.get(node_id)]
+
+##================== Search ======================
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL, max_entries=256)
+def search_nodes(_driver, text, limit=SEARCH_RESULT_LIMIT):
+    """Looks names up in the full-text index. Returns [{"id", "labels", "name", "status", "score"}], best first."""
+    query = fulltext_query(text)
+    if query is None:
+        return []
+    records = read_query(_driver, "CALL db.index.fulltext.queryNodes($index, $query, {limit: $limit}) "
+                                  "YIELD node, score "
+                                  "RETURN elementId(node) AS id, labels(node) AS labels, node.name AS name, "
+                                  "node.status AS status, score",
+                         index=SEARCH_INDEX_NAME, query=query, limit=limit)
+    return [dict(record) for record in records]
 
 ##================== Database Interaction Functions ======================
 
-def format_cypher_properties(props):
-    """Formats a dictionary of properties into a Cypher map string, escaping values."""
-    items = []
-    for key, value in props.items():
-        # Use backticks for keys to handle special characters or keywords
-        formatted_key = f"`{key}`"
-        if isinstance(value, str):
-            # Escape backslashes and single quotes in the string value
-            escaped_value = value.replace('\\', '\\\\').replace("'", "\\'")
-            formatted_value = f"'{escaped_value}'"
-        elif isinstance(value, (int, float, bool)):
-            formatted_value = str(value)
+@st.cache_data(max_entries=1000)
+def fetch_node_properties(_driver, node_id, graph_version):
+    """Fetches properties for a specific node by its element ID."""
+    records = read_query(_driver, "MATCH (n) WHERE elementId(n) = $node_id RETURN properties(n) AS props", node_id=node_id)
+    return records[0]['props'] if records else {}
+
+##================== Write-behind Edits ======================
+
+def queue_edit(pending_edits, node_id, current_props, changes):
+    """
+    Merges changes into the queued edit for node_id. The database value of every key is
+    remembered the first time the key is edited, so the flush can tell if someone else changed
+    it meanwhile. Keys set to the value the database holds now (`current_props`) are dropped,
+    and so is an edit left empty. A key set back to its remembered value after the database
+    moved on is kept, so the flush reports the conflict.
+    """
+    edit = pending_edits.setdefault(node_id, {"name": current_props.get('name'), "base": {}, "props": {},
+                                              "queued_at": time.time()})
+    for key, value in changes.items():
+        edit["base"].setdefault(key, current_props.get(key))
+        if value == current_props.get(key):
+            del edit["base"][key]
+            edit["props"].pop(key, None)
         else:
-            # For other types (like lists or null), convert to string and quote
-            escaped_value = str(value).replace('\\', '\\\\').replace("'", "\\'")
-            formatted_value = f"'{escaped_value}'"
-        items.append(f"{formatted_key}: {formatted_value}")
-    return "{" + ", ".join(items) + "}"
-
-def create_database_snapshot(_driver, file_path):
-    """Queries the current database state and writes it to a .cql snapshot file."""
-    cypher_statements = []
+            edit["props"][key] = value
+    if not edit["props"]:
+        del pending_edits[node_id]
+
+def overlay_pending_edits(processed_records, pending_edits):
+    """Returns the records with queued edits applied to their nodes, for drawing before the flush."""
+    if not pending_edits:
+        return processed_records
+
+    def patch(node):
+        edit = pending_edits.get(node['id'])
+        return node if edit is None else {**node, "properties": {**node['properties'], **edit['props']}}
+
+    return [{**record, "source": patch(record['source']), "target": patch(record['target'])}
+            if record['source']['id'] in pending_edits or record['target']['id'] in pending_edits else record
+            for record in processed_records]
+
+##================== Sidebar and Form Rendering ======================
+def render_bulk_edit(driver):
+    """
+    Sidebar section for set-based operations on the nodes picked in multi-select mode.
+    Returns True if it wrote to the graph.
+    """
+    st.sidebar.header("Bulk Edit")
+    graph_cache = session_graph_cache()
+
+    def node_name(node_id):
+        node = graph_cache.nodes.get(node_id)
+        return node['properties'].get('name', node_id) if node else node_id
+
+    selection = st.sidebar.multiselect("Selected subtrees", options=sorted(st.session_state.bulk_selection, key=node_name),
+                                       default=sorted(st.session_state.bulk_selection, key=node_name),
+                                       format_func=node_name)
+    if set(selection) != st.session_state.bulk_selection:
+        st.session_state.bulk_selection = set(selection)
+        st.rerun()
+
+    bulk_status = st.sidebar.selectbox("New status", options=TASK_STATUSES, key="bulk_status")
+    new_parent = st.sidebar.text_input("New parent name", key="bulk_new_parent")
+    status_column, remove_column = st.sidebar.columns(2)
+    wrote = False
     try:
-        with _driver.session() as session:
-            # 1. Start with a command to clear the database
-            cypher_statements.append("MATCH (n) DETACH DELETE n;")
-            cypher_statements.append("\n// --- Creating Nodes ---")
-
-            # 2. Fetch all nodes and generate CREATE statements
-            nodes_result = session.run("MATCH (n) RETURN n")
-            nodes_data = [record['n'] for record in nodes_result]
-
-            if not nodes_data:
-                with open(file_path, 'w') as f:
-                    f.write("// Database is empty. No snapshot created.")
-                return True, "Snapshot created (database was empty)."
-
-            for node in nodes_data:
-                labels = ":".join(node.labels)
-                props = format_cypher_properties(dict(node))
-                cypher_statements.append(f"CREATE (:{labels} {props});")
-
-            cypher_statements.append("\n// --- Creating Relationships ---")
-
-            # 3. Fetch all relationships and generate CREATE statements
-            rels_result = session.run("MATCH (n)-[r]->(m) RETURN n, r, m")
-            for record in rels_result:
-                source_node, rel, target_node = record['n'], record['r'], record['m']
-                source_match = f"(a:{':'.join(source_node.labels)} {format_cypher_properties(dict(source_node))})"
-                target_match = f"(b:{':'.join(target_node.labels)} {format_cypher_properties(dict(target_node))})"
-                rel_create = f"[:`{rel.type}` {format_cypher_properties(dict(rel))}]" if dict(rel) else f"[:`{rel.type}`]"
-                cypher_statements.append(f"MATCH {source_match}, {target_match} CREATE (a)-{rel_create}->(b);")
-
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(cypher_statements))
-        return True, f"Snapshot created at `{os.path.basename(file_path)}`"
+        if status_column.button("Set Status", help="Sets the status of every node in the selected subtrees."):
+            with st.spinner("Updating subtrees..."):
+                updated = set_subtree_status(driver, selection, bulk_status, graph_cache=graph_cache)
+            wrote = True
+            st.sidebar.success(f"Status set to '{bulk_status}' on {updated} nodes.")
+        if remove_column.button("Complete & Remove", help="Deletes the selected nodes and everything below them."):
+            with st.spinner("Removing subtrees..."):
+                deleted = delete_subtrees(driver, selection, graph_cache=graph_cache)
+            wrote = True
+            st.session_state.bulk_selection = set()
+            st.session_state.selected_node = None
+            st.sidebar.success(f"Removed {deleted} nodes.")
+        if st.sidebar.button("Move Under Parent", disabled=not new_parent):
+            with st.spinner("Moving subtrees..."):
+                moved, rejected = move_subtrees(driver, selection, new_parent)
+            wrote = True
+            st.sidebar.success(f"Moved {moved} subtrees under '{new_parent}'.")
+            if rejected:
+                st.sidebar.warning(f"Not moved, since their type cannot sit under '{new_parent}': {', '.join(rejected)}")
     except Exception as e:
-        return False, f"An error occurred during snapshot creation: {e}"
+        st.sidebar.error(f"Bulk edit failed: {e}")
 
-@st.cache_data(ttl=5) # ttl=5, Use a short cache to get fresh data for editing
-def fetch_node_properties(_driver, node_id):
-    """Fetches properties for a specific node by its element ID."""
-    with _driver.session() as session:
-        result = session.run("MATCH (n) WHERE elementId(n) = $node_id RETURN properties(n) AS props", node_id=node_id)
-        record = result.single()
-        return record['props'] if record else {}
-
-def update_node_properties(_driver, node_id, new_properties):
-    """Updates properties for a specific node using its element ID."""
-    with _driver.session() as session:
-        # Using SET n += $props is a convenient way to update properties from a dictionary
-        session.run("MATCH (n) WHERE elementId(n) = $node_id SET n += $props", 
-                    node_id=node_id, props=new_properties)
-
-def delete_node(_driver, node_id):
-    """Deletes a node and its relationships using its element ID."""
-    with _driver.session() as session:
-        # DETACH DELETE removes the node and all its relationships
-        result = session.run("MATCH (n) WHERE elementId(n) = $node_id DETACH DELETE n", 
-                             node_id=node_id)
-        if result.consume().counters.nodes_deleted == 0:
-            raise Exception("Node could not be deleted. It might have been removed already.")
-
-def create_node_and_relationship(_driver, node_name, parent_node_name, relationship_type):
-    """Creates a new node and a relationship to a parent node."""
-    # Define allowed relationships and their corresponding new node labels
-    rel_to_label_map = {
-        "HAS_TASK": "Task",
-        "HAS_SUBTASK": "SubTask",
-        "HAS_TASK_TYPE": "Task_Category"
-    }
+    if st.sidebar.button("Clear Bulk Selection"):
+        st.session_state.bulk_selection = set()
+        st.rerun()
+    return wrote
 
-    if relationship_type not in rel_to_label_map:
-        raise ValueError(f"Invalid relationship type: {relationship_type}. Must be one of {list(rel_to_label_map.keys())}")
+def render_profiling_panel(profiler):
+    """Sidebar debug panel with the latest rerun's phase and query timings and export buttons."""
+    def toggle_profiling():
+        st.session_state.profiling = st.session_state.profiling_toggle
 
-    node_label = rel_to_label_map[relationship_type]
+    with st.sidebar.expander("Debug: Profiling"):
+        st.toggle("Profile queries and phases", value=st.session_state.profiling, key="profiling_toggle",
+                  on_change=toggle_profiling,
+                  help="Time every Cypher query and each phase of a rerun for this session.")
+        if profiler is None:
+            st.caption("Profiling is off.")
+            return
+        rerun = profiler.last_completed_rerun()
+        if rerun:
+            st.caption(f"Rerun {rerun['rerun']} of {profiler.rerun_count}")
+            st.dataframe(pd.DataFrame(rerun["phases"]), hide_index=True)
+            queries = [entry for entry in profiler.queries if entry["rerun"] == rerun["rerun"]]
+            if queries:
+                st.dataframe(pd.DataFrame(queries)[["query", "rows", "parameters_bytes", "server_available_ms",
+                                                    "server_consumed_ms", "client_ms", "wall_ms"]],
+                             hide_index=True)
+        st.download_button("Export JSON Lines", profiler.to_jsonl(), file_name="todo_app_profile.jsonl",
+                           mime="application/jsonl")
+        st.download_button("Export Prometheus Text", profiler.to_prometheus(), file_name="todo_app_profile.prom",
+                           mime="text/plain")
+        if st.button("Clear Profile"):
+            st.session_state.profiler = QueryProfiler()
+            st.rerun()
 
-    with _driver.session() as session:
-        # This query finds the parent, creates the new node, and then the relationship.
-        # The node label and relationship type are validated above, so f-string is safe here.
-        query = (f"MATCH (p {{name: $parent_node_name}}) "
-                 f"CREATE (n:{node_label} {{name: $node_name, status: 'Planning'}}) "
-                 f"CREATE (p)-[:`{relationship_type}`]->(n)")
-        result = session.run(query, node_name=node_name, parent_node_name=parent_node_name)
-        if result.consume().counters.nodes_created == 0:
-            raise Exception(f"Could not create node. Parent node '{parent_node_name}' might not exist.")
+def render_search(driver):
+    """Sidebar name search with jump-to-node and use-as-parent actions on each result."""
+    st.sidebar.header("Search")
+    search_text = st.sidebar.text_input("Find a node by name", key="search_text",
+                                        placeholder="Type part of a name and press Enter")
+    if not search_text.strip():
+        return
+    try:
+        results = search_nodes(driver, search_text.strip())
+    except Exception as e:
+        st.sidebar.error(f"Search failed: {e}")
+        return
+    if not results:
+        st.sidebar.caption("No matching nodes.")
+        return
+    for result in results:
+        name_column, jump_column, parent_column = st.sidebar.columns([3, 1, 1])
+        label = next((label for label in result['labels'] if label in TODO_LABELS), "/".join(result['labels']))
+        name_column.markdown(f"**{result['name']}**  \n{label} · {result['status'] or 'No status'}")
+        if jump_column.button("Jump", key=f"search_jump_{result['id']}", help="Show this node and its neighbourhood"):
+            st.session_state.focus_node = result['id']
+            st.session_state.selected_node = result['id']
+            st.session_state.graph_visible = True
+            st.rerun()
+        # The create form is drawn further down, so its field can still be set in this run
+        if parent_column.button("Parent", key=f"search_parent_{result['id']}", help="Use as ParentNodeName below"):
+            st.session_state.parent_node_name = result['name']
 
-##================== Sidebar and Form Rendering ======================
-def render_sidebar(driver):
+@st.fragment(run_every=WRITE_BEHIND_FLUSH_INTERVAL)
+def render_pending_edits(driver):
+    """
+    Queued write-behind edits with Commit and Discard buttons. Re-runs on its own and flushes
+    the queue once its oldest edit has waited WRITE_BEHIND_FLUSH_INTERVAL seconds.
+    """
+    st.subheader("Pending Edits")
+    flush_result = st.session_state.pop('flush_result', None)
+    if flush_result:
+        applied, conflicts = flush_result
+        st.success(f"Committed {applied} edits.")
+        for name, keys in conflicts:
+            if keys == [DELETED_CONFLICT]:
+                st.warning(f"'{name}' was not saved: it was deleted from the database since it was edited.")
+            else:
+                st.warning(f"'{name}' was not saved: {', '.join(keys)} changed in the database since it was edited.")
+    pending_edits = st.session_state.pending_edits
+    if not pending_edits:
+        st.caption("No pending edits.")
+        return
+    for edit in pending_edits.values():
+        st.caption(f"{edit['name']}: " + ", ".join(f"{key} → {value}" for key, value in edit['props'].items()))
+    commit_column, discard_column = st.columns(2)
+    due = time.time() - min(edit['queued_at'] for edit in pending_edits.values()) >= WRITE_BEHIND_FLUSH_INTERVAL
+    if commit_column.button(f"Commit {len(pending_edits)}") or due:
+        try:
+            applied, conflicts = flush_edits(driver, pending_edits, graph_cache=session_graph_cache())
+        except Exception as e:
+            # The queue is kept, so a failed batch is retried on the next timer run unless discarded
+            st.error(f"Commit failed: {e}")
+            return
+        st.session_state.flush_result = (len(applied), [(pending_edits[node_id]['name'], keys)
+                                                         for node_id, keys in conflicts.items()])
+        st.session_state.pending_edits = {}
+        st.rerun(scope="app")
+    if discard_column.button("Discard"):
+        st.session_state.pending_edits = {}
+        st.rerun(scope="app")
+
+def sidebar_progress(unit="statements"):
+    """Returns a progress_callback that drives a progress bar in the sidebar."""
+    progress_bar = st.sidebar.progress(0.0)
+
+    def update(done, total):
+        progress_bar.progress(done / total if total else 1.0, text=f"{done} / {total} {unit}")
+    return update
+
+def render_sidebar(driver, graph_version):
     """
     This function acts as an "alias" for the sidebar UI.
     It renders all sidebar components, including the always-visible edit form.
+    Returns True if a bulk edit or import wrote to the graph without rerunning the app.
     """
     st.sidebar.header("Database Controls")
 
+    snapshot_format = st.sidebar.radio("Snapshot format", ["Compact", "Cypher script"], horizontal=True,
+                                       help="Compact snapshots are gzip-compressed JSON lines kept in "
+                                            "`cql_scripts/snapshots`; Cypher script is the single `todo_snapshot.cql`.")
+    compact = snapshot_format == "Compact"
+    incremental = compact and st.sidebar.checkbox("Incremental backup", value=False,
+                                                  help="Only record what changed since the last compact snapshot.")
+
     if st.sidebar.button("Backup Snapshot"):
         with st.spinner("Creating database snapshot..."):
-            snapshot_dir = os.path.join(os.path.dirname(__file__), 'cql_scripts')
-            os.makedirs(snapshot_dir, exist_ok=True) # Ensure directory exists
-            snapshot_path = os.path.join(snapshot_dir, 'todo_snapshot.cql')
-            success, message = create_database_snapshot(driver, snapshot_path)
+            if compact:
+                success, message = create_compact_snapshot(driver, COMPACT_SNAPSHOT_DIR, incremental=incremental)
+            else:
+                snapshot_dir = os.path.join(os.path.dirname(__file__), 'cql_scripts')
+                os.makedirs(snapshot_dir, exist_ok=True) # Ensure directory exists
+                snapshot_path = os.path.join(snapshot_dir, 'todo_snapshot.cql')
+                success, message = create_database_snapshot(driver, snapshot_path)
             if success:
                 st.sidebar.success(message)
             else:
                 st.sidebar.error(message)
     
     if st.sidebar.button("Load Snapshot"):
-        with st.spinner("Setting up database from `todo_snapshot.cql`..."):
-            script_path = os.path.join(os.path.dirname(__file__), 'cql_scripts', 'todo_snapshot.cql')
-            success, message = run_cypher_script(driver, script_path)
+        with st.spinner("Restoring the latest compact snapshot..." if compact
+                        else "Setting up database from `todo_snapshot.cql`..."):
+            if compact:
+                success, message = restore_compact_snapshot(driver, COMPACT_SNAPSHOT_DIR,
+                                                            progress_callback=sidebar_progress("files"))
+            else:
+                script_path = os.path.join(os.path.dirname(__file__), 'cql_scripts', 'todo_snapshot.cql')
+                success, message = run_cypher_script(driver, script_path, progress_callback=sidebar_progress())
             if success:
                 st.sidebar.success(message)
-                st.cache_data.clear()
                 st.session_state.graph_visible = True
                 st.rerun()
             else:
@@ -216,16 +934,21 @@ def render_sidebar(driver):
     if st.sidebar.button("Setup / Reset Database"):
         with st.spinner("Setting up database from `create_todo_db.cql`..."):
             script_path = os.path.join(os.path.dirname(__file__), 'cql_scripts', 'create_todo_db.cql')
-            success, message = run_cypher_script(driver, script_path)
+            success, message = run_cypher_script(driver, script_path, progress_callback=sidebar_progress())
             if success:
+                schema_ok, schema_message = ensure_schema(driver)
+                if not schema_ok:
+                    st.sidebar.warning(schema_message)
                 st.sidebar.success(message)
-                st.cache_data.clear()
                 st.session_state.graph_visible = True
                 st.rerun()
             else:
                 st.sidebar.error(message)
 
     st.sidebar.header("Edit Node")
+    write_behind = st.sidebar.toggle("Write-behind edits", value=False, key="write_behind",
+                                     help="Show edits right away and write them in one batch every "
+                                          f"{WRITE_BEHIND_FLUSH_INTERVAL} seconds or on Commit.")
 
     node_id = st.session_state.get('selected_node')
     node_props = {}
@@ -233,7 +956,7 @@ def render_sidebar(driver):
 
     if is_node_selected:
         try:
-            node_props = fetch_node_properties(driver, node_id)
+            node_props = fetch_node_properties(driver, node_id, graph_version)
             if not node_props:
                 st.sidebar.warning("Could not find properties for the selected node.")
                 st.session_state.selected_node = None
@@ -243,20 +966,27 @@ def render_sidebar(driver):
             st.session_state.selected_node = None
             st.rerun()
 
+    # Queued edits are shown in place of the database values they will replace
+    if is_node_selected and node_id in st.session_state.pending_edits:
+        shown_props = {**node_props, **st.session_state.pending_edits[node_id]['props']}
+    else:
+        shown_props = node_props
+
     # Display a dynamic subheader
-    st.sidebar.subheader(f"Editing: {node_props.get('name', 'N/A')}" if is_node_selected else "Select a node to edit")
+    st.sidebar.subheader(f"Editing: {shown_props.get('name', 'N/A')}" if is_node_selected else "Select a node to edit")
 
     with st.sidebar.form(key="edit_node_form"):
         new_props = {}
         # Dynamically create inputs. They will be disabled if no node is selected.
-        for key, value in node_props.items():
+        for key, value in shown_props.items():
+            if key in CHANGE_TIMESTAMP_PROPERTIES:
+                continue
             if key == 'status':
-                status_options = ["Planning", "InProgress", "Done"]
                 # Ensure current value is in options, otherwise default to first
-                current_index = status_options.index(value) if value in status_options else 0
+                current_index = TASK_STATUSES.index(value) if value in TASK_STATUSES else 0
                 new_props[key] = st.selectbox(
                     "Status", 
-                    options=status_options, 
+                    options=TASK_STATUSES, 
                     index=current_index, 
                     key="edit_status", 
                     disabled=not is_node_selected
@@ -270,33 +1000,52 @@ def render_sidebar(driver):
             if new_props.get('status') == 'Done':
                 try:
                     with st.spinner("Completing and removing task..."):
-                        delete_node(driver, node_id)
-                    st.cache_data.clear()
+                        # The whole subtree goes with it, so no SubTasks are left orphaned
+                        delete_subtrees(driver, [node_id], graph_cache=session_graph_cache())
+                    st.session_state.pending_edits.pop(node_id, None)
                     st.session_state.selected_node = None
                     st.sidebar.success("Task marked as 'Done' and removed!")
                     st.rerun()
                 except Exception as e:
                     st.sidebar.error(f"Error deleting node: {e}")
-            else:
-                with st.spinner("Updating node..."):
-                    update_node_properties(driver, node_id, new_props)
-                    st.cache_data.clear()
-                    st.session_state.selected_node = None
-                st.sidebar.success("Node updated successfully!")
+            elif write_behind:
+                # Only the fields changed in the form are queued, so unrelated edits elsewhere do not conflict
+                changes = {key: value for key, value in new_props.items()
+                           if value != (shown_props[key] if key == 'status' else str(shown_props[key]))}
+                queue_edit(st.session_state.pending_edits, node_id, node_props, changes)
+                st.session_state.selected_node = None
                 st.rerun()
+            else:
+                try:
+                    with st.spinner("Updating node..."):
+                        update_node_properties(driver, node_id, new_props, graph_cache=session_graph_cache())
+                        st.session_state.selected_node = None
+                    st.sidebar.success("Node updated successfully!")
+                    st.rerun()
+                except Exception as e:
+                    # e.g. renaming a node to a name that the uniqueness constraint already holds
+                    st.sidebar.error(f"Error updating node: {e}")
 
     # A separate button outside the form to clear the selection
     if st.sidebar.button("Clear Selection", disabled=not is_node_selected):
         st.session_state.selected_node = None
         st.rerun()
 
+    if write_behind or st.session_state.pending_edits:
+        with st.sidebar:
+            render_pending_edits(driver)
+
+    wrote = bool(st.session_state.get('bulk_selection')) and render_bulk_edit(driver)
+
+    render_search(driver)
+
     st.sidebar.header("Create New Node")
     with st.sidebar.form(key="create_node_form", clear_on_submit=True):
         node_name = st.text_input("NodeName", key="new_node_name")
         parent_name = st.text_input("ParentNodeName", key="parent_node_name")
         relation_type = st.selectbox(
             "RelationWithParent",
-            options=["HAS_TASK", "HAS_SUBTASK", "HAS_TASK_TYPE"],
+            options=list(REL_TO_LABEL_MAP.keys()),
             index=0,
             help="This determines the new node's type (e.g., HAS_TASK creates a Task node)."
         )
@@ -309,72 +1058,199 @@ def render_sidebar(driver):
             else:
                 try:
                     with st.spinner("Creating node..."):
-                        create_node_and_relationship(driver, node_name, parent_name, relation_type)
-                    st.cache_data.clear()
+                        create_node_and_relationship(driver, node_name, parent_name, relation_type,
+                                                     graph_cache=session_graph_cache())
                     st.sidebar.success("Node created successfully! Refreshing graph...")
                     st.rerun()
                 except Exception as e:
                     st.sidebar.error(f"Error: {e}")
+
+    st.sidebar.header("Bulk Import")
+    import_file = st.sidebar.file_uploader("Tasks file (name, parent, relationship_type, status)",
+                                           type=["csv", "json", "jsonl"], key="import_file")
+    if st.sidebar.button("Import Tasks", disabled=import_file is None):
+        progress_text = st.sidebar.empty()
+        try:
+            with st.spinner("Importing tasks..."):
+                created, failures = import_tasks(
+                    driver, import_file,
+                    progress_callback=lambda rows_read, created: progress_text.caption(f"{rows_read} rows read, {created} nodes created"))
+            wrote = True
+            st.sidebar.success(f"Imported {created} nodes.")
+            if failures:
+                st.sidebar.warning(f"{len(failures)} rows were not imported.")
+                st.sidebar.dataframe(pd.DataFrame(failures, columns=["row", "name", "reason"]), hide_index=True)
+        except Exception as e:
+            st.sidebar.error(f"Import failed: {e}")
+    return wrote
 ##========================================================================
 
-def draw_graph(processed_records):
-    """Draws the graph using streamlit-agraph."""
+def compute_tree_layout(processed_records, previous_positions=None):
+    """
+    Places nodes as a top-down tree rooted at the nodes without a HAS_* parent.
+    Nodes already in `previous_positions` keep their coordinates; only new nodes are placed,
+    next to their siblings under their parent, so adding a task does not reflow the canvas.
+    When most nodes are new (e.g. going from a focus or filter view to the full graph) the
+    whole tree is laid out afresh instead. Returns {node_id: (x, y)}.
+    """
+    children = {}
+    has_parent = set()
+    order = [] # node ids in first-seen order, for a stable layout
+    for record in processed_records:
+        source_id, target_id = str(record['source']['id']), str(record['target']['id'])
+        for node_id in (source_id, target_id):
+            if node_id not in children:
+                children[node_id] = []
+                order.append(node_id)
+        # The first tree parent wins, which keeps the layout a tree
+        is_tree_edge = record['relationship']['type'] in TREE_RELATIONSHIPS or record['relationship']['type'] == SUMMARY_REL_TYPE
+        if is_tree_edge and target_id not in has_parent and target_id != source_id:
+            children[source_id].append(target_id)
+            has_parent.add(target_id)
+    roots = [node_id for node_id in order if node_id not in has_parent]
+
+    positions = {node_id: position for node_id, position in (previous_positions or {}).items() if node_id in children}
+    if len(positions) < LAYOUT_KEEP_SHARE * len(children):
+        positions = {}
+        # Fresh layout: leaves take consecutive slots and parents are centred over their children
+        next_slot = 0
+        for root in roots:
+            stack = [(root, 0, False)]
+            while stack:
+                node_id, depth, visited = stack.pop()
+                kids = children[node_id]
+                if not visited:
+                    stack.append((node_id, depth, True))
+                    stack.extend((kid, depth + 1, False) for kid in reversed(kids))
+                elif kids:
+                    positions[node_id] = ((positions[kids[0]][0] + positions[kids[-1]][0]) / 2, depth * LAYOUT_LEVEL_SPACING)
+                else:
+                    positions[node_id] = (next_slot * LAYOUT_NODE_SPACING, depth * LAYOUT_LEVEL_SPACING)
+                    next_slot += 1
+
+    # Incremental placement of anything not positioned yet, in breadth-first order from the roots
+    occupied = {}
+    for x, y in positions.values():
+        occupied.setdefault(y, set()).add(round(x / LAYOUT_NODE_SPACING))
+
+    def place(node_id, y, slot):
+        level = occupied.setdefault(y, set())
+        while slot in level:
+            slot += 1
+        level.add(slot)
+        positions[node_id] = (slot * LAYOUT_NODE_SPACING, y)
+
+    # Breadth-first from the roots, so a parent is always placed before its children;
+    # nodes only reachable through a cycle are started on the top level once the roots are done
+    queue = collections.deque(roots)
+    queued = set(roots)
+    unreached = iter(order)
+    while True:
+        if not queue:
+            node_id = next((node_id for node_id in unreached if node_id not in queued), None)
+            if node_id is None:
+                break
+            queue.append(node_id)
+            queued.add(node_id)
+        node_id = queue.popleft()
+        queue.extend(kid for kid in children[node_id] if kid not in queued)
+        queued.update(children[node_id])
+        if node_id not in positions:
+            place(node_id, 0, 0)
+        parent_x, parent_y = positions[node_id]
+        kids = children[node_id]
+        placed = [positions[kid][0] for kid in kids if kid in positions]
+        slot = round((max(placed) / LAYOUT_NODE_SPACING) + 1 if placed else parent_x / LAYOUT_NODE_SPACING)
+        for kid in kids:
+            if kid not in positions:
+                place(kid, parent_y + LAYOUT_LEVEL_SPACING, slot)
+                slot = round(positions[kid][0] / LAYOUT_NODE_SPACING) + 1
+    return positions
+
+def node_display_label(node_data):
+    """Use a property for the label, like 'name' or 'title'. Fallback to the first property value."""
+    props = node_data['properties']
+    return str(props.get('name') or props.get('title') or next(iter(props.values()), node_data['id']))
+
+@functools.lru_cache(maxsize=WIDGET_CACHE_SIZE)
+def node_widget(node_id, main_label, label, position=None, highlighted=False):
+    """Builds (once per id, label, display text, position and highlight) the agraph Node for a graph node."""
+    node_color = NODE_COLOR_MAP.get(main_label, DEFAULT_NODE_COLOR)
+    extra = {"x": position[0], "y": position[1]} if position else {}
+    if highlighted:
+        # Nodes picked for a bulk edit get a thick, dark border
+        node_color = {"background": node_color, "border": HIGHLIGHT_BORDER_COLOR}
+        extra["borderWidth"] = 4
+    return Node(id=node_id, label=wrap_text(label), size=25, shape='circle', color=node_color,
+                font={'size': 9, 'align': 'middle'}, **extra)
+
+@functools.lru_cache(maxsize=WIDGET_CACHE_SIZE)
+def edge_widget(source_id, target_id, rel_type):
+    """Builds (once per endpoint pair and type) the agraph Edge, labelled with the relationship type."""
+    return Edge(source=source_id, target=target_id, label=rel_type, weight=5, length=150,
+                font={'size': 9, 'align': 'middle'})
+
+def build_graph_elements(processed_records, positions=None, highlighted_ids=frozenset()):
+    """
+    Converts processed records into deduplicated agraph Node and Edge lists.
+    `positions` ({node_id: (x, y)}) pins nodes to precomputed coordinates.
+    """
+    positions = positions or {}
     nodes = []
     edges = []
     node_ids = set()
 
     for record in processed_records:
-        source_data = record['source']
-        target_data = record['target']
-        relationship_data = record['relationship']
-
-        source_id = str(source_data['id'])
-        if source_id not in node_ids:
-            # Use a property for the label, like 'name' or 'title'. Fallback to the first property value.
-            # label = source_node.get('name') or source_node.get('title') or next(iter(source_node.values()), source_id)
-            source_props = source_data['properties']
-            source_labels = source_data.get('labels', [])
-            source_name = source_props['name']
-            source_main_label = source_labels[0] if source_labels else None
-            # print(source_main_label)
-            node_color = NODE_COLOR_MAP.get(source_main_label, DEFAULT_NODE_COLOR)
-            # if source_name == START_NODE_NAME:
-            #     node_color = NODE_COLOR_MAP.get("START_NODE", DEFAULT_NODE_COLOR)
-            label = source_props.get('name') or source_props.get('title') or next(iter(source_props.values()), source_id)
-            wrap_label = wrap_text(label)
-            # nodes.append(Node(id=source_id, label=str(label), size=25, shape='circle', font={'size': 10, 'align': 'middle'}))
-            nodes.append(Node(id=source_id, label=str(wrap_label), size=25, shape='circle', color=node_color, font={'size': 9, 'align': 'middle'}))
-            node_ids.add(source_id)
-
-        target_id = str(target_data['id'])
-        if target_id not in node_ids:
-            # label = target_node.get('name') or target_node.get('title') or next(iter(target_node.values()), target_id)
-            target_props = target_data['properties']
-            target_labels = target_data.get('labels', [])
-            target_main_label = target_labels[0] if target_labels else None
-            # print(target_main_label)
-            # print(target_props['name'])
-            node_color = NODE_COLOR_MAP.get(target_main_label, DEFAULT_NODE_COLOR)
-            
-            label = target_props.get('name') or target_props.get('title') or next(iter(target_props.values()), target_id)
-            wrap_label = wrap_text(label)
-            # nodes.append(Node(id=target_id, label=str(label), size=25, shape='circle', font={'size': 10}))
-            nodes.append(Node(id=target_id, label=str(wrap_label), size=25, shape='circle', color=node_color, font={'size': 9}))
-            node_ids.add(target_id)
-
-        # Use the relationship type as the edge label
-        # edges.append(Edge(source=source_id, target=target_id, label=relationship.type))
-        edges.append(Edge(source=source_id, target=target_id, \
-                          label=relationship_data['type'], \
-                          weight=5,
-                          length=150,
-                          font={'size': 9, 'align': 'middle'}))
+        for node_data in (record['source'], record['target']):
+            node_id = str(node_data['id'])
+            if node_id not in node_ids:
+                node_ids.add(node_id)
+                labels = node_data.get('labels') or [None]
+                nodes.append(node_widget(node_id, labels[0], node_display_label(node_data), positions.get(node_id),
+                                         node_id in highlighted_ids))
+        edges.append(edge_widget(str(record['source']['id']), str(record['target']['id']),
+                                 record['relationship']['type']))
+    return nodes, edges
+
+def memo_view(key, inputs, compute, source=None):
+    """
+    Returns compute(), kept in st.session_state[key] while `inputs` compare equal and `source`
+    (the view it is derived from) is the same object. Reruns that change neither get the same
+    list back, so draw_graph can reuse its widgets without looking at a single record.
+    """
+    cached = st.session_state.get(key)
+    if cached is not None and cached[0] is source and cached[1] == inputs:
+        return cached[2]
+    view = compute()
+    st.session_state[key] = (source, inputs, view)
+    return view
+
+def draw_graph(processed_records, precomputed_layout=False, highlighted_ids=frozenset()):
+    """
+    Draws the graph using streamlit-agraph.
+    With precomputed_layout=True node positions come from compute_tree_layout and the
+    browser-side physics simulation is switched off. Nodes in highlighted_ids get a border.
+    """
+    # GraphCache.view() hands back the same list while nothing changed, so a rerun that
+    # touches no data reuses the previous widgets without looking at a single record
+    options = (precomputed_layout, frozenset(highlighted_ids))
+    cached = st.session_state.get('graph_elements')
+    if cached is not None and cached[0] is processed_records and cached[1] == options:
+        nodes, edges = cached[2], cached[3]
+    else:
+        positions = None
+        if precomputed_layout:
+            # Positions survive graph changes, so only nodes new to this view get placed
+            positions = compute_tree_layout(processed_records, st.session_state.get('layout_positions'))
+            st.session_state.layout_positions = positions
+        nodes, edges = build_graph_elements(processed_records, positions, options[1])
+        st.session_state.graph_elements = (processed_records, options, nodes, edges)
 
     # Configure the graph's appearance
     config = Config(width=800,
                     height=800,
                     directed=True,
-                    physics=True,
+                    physics=not precomputed_layout,
                     hierarchical=False,
                     interaction={"navigationButtons": True, "zoomView": True, "dragView": True},
                     zoomView=True,
@@ -402,19 +1278,43 @@ def main():
         st.session_state.graph_visible = False
     if 'selected_node' not in st.session_state:
         st.session_state.selected_node = None
+    if 'expanded_nodes' not in st.session_state:
+        st.session_state.expanded_nodes = set()
+    if 'bulk_selection' not in st.session_state:
+        st.session_state.bulk_selection = set()
+    if 'pending_edits' not in st.session_state:
+        st.session_state.pending_edits = {}
+
+    try:
+        driver = get_driver()
+    except Exception as e:
+        st.error(f"Could not connect to Neo4j: {e}")
+        st.stop()
+    profiler = get_session_profiler()
+    if profiler is not None:
+        profiler.start_rerun()
+        driver = ProfiledDriver(driver, profiler)
+    with profile_phase(profiler, "schema"):
+        schema_ok, schema_message = bootstrap_schema(driver)
+    if not schema_ok:
+        st.sidebar.warning(schema_message)
 
-    driver = get_driver()
+    # Read once per rerun and passed down. The st.cache_data fetchers take it only as part of
+    # their cache key, so each caches one result per version of the graph and refetches after any write.
+    with profile_phase(profiler, "graph_version"):
+        graph_version = fetch_graph_version(driver)
+        st.session_state.graph_version_read_at = time.time()
 
     # --- Sidebar Rendering (The "Alias") ---
     # This function now handles all sidebar logic, including the edit form.
-    render_sidebar(driver)
+    with profile_phase(profiler, "sidebar"):
+        if render_sidebar(driver, graph_version):
+            graph_version = fetch_graph_version(driver)
 
     # --- Main Content Area ---
     # st.header("ToDo Graph")
     button_text = "Hide ToDo Graph" if st.session_state.graph_visible else "Load ToDo Graph"
     if st.button(button_text):
-        if not st.session_state.graph_visible:
-            st.cache_data.clear()
         st.session_state.graph_visible = not st.session_state.graph_visible
         if not st.session_state.graph_visible:
             st.session_state.selected_node = None
@@ -422,16 +1322,98 @@ def main():
 
     # --- Graph Display and Node Selection Logic ---
     if st.session_state.graph_visible:
-        records = fetch_graph_data(driver)
-        if not records:
+        progressive = st.toggle("Progressive loading", value=True, key="progressive_loading",
+                                help=f"Load {GRAPH_LOAD_DEPTH} levels below the Start_Node and fetch children when a node is clicked.")
+        collapse = st.toggle("Collapse subtrees", value=False, key="collapse_subtrees",
+                             help="Draw deep or large subtrees as one summary node with per-status counts. Click a summary to expand it.")
+        if collapse:
+            depth_column, threshold_column = st.columns(2)
+            collapse_depth = depth_column.number_input("Collapse below depth", min_value=1, value=COLLAPSE_DEPTH)
+            collapse_threshold = threshold_column.number_input("Collapse above children", min_value=1, value=COLLAPSE_THRESHOLD)
+        multi_select = st.toggle("Multi-select", value=False, key="multi_select",
+                                 help="Clicking a node adds it to (or removes it from) the bulk edit selection in the sidebar. "
+                                      "A second click on the node clicked last is ignored; remove it in the sidebar instead.")
+        if st.session_state.expanded_nodes and st.button("Collapse All"):
+            st.session_state.expanded_nodes = set()
+            st.rerun()
+        auto_refresh = st.toggle("Auto-refresh", value=True, key="auto_refresh",
+                                 help=f"Check every {GRAPH_POLL_INTERVAL} seconds whether anyone changed the graph and redraw it if so.")
+        precomputed_layout = st.toggle("Precomputed layout", value=False, key="precomputed_layout",
+                                       help="Lay the tree out on the server and turn off the browser physics simulation. Recommended for large graphs.")
+        filtering = st.toggle("Filter", value=False, key="filter_graph",
+                              help="Only draw the paths from the Start_Node to nodes matching the filters.")
+        if filtering:
+            status_column, label_column, category_column, depth_column = st.columns(4)
+            filter_statuses = status_column.multiselect("Status", TASK_STATUSES, key="filter_statuses")
+            filter_labels = label_column.multiselect("Label", [label for label in TODO_LABELS if label != "Start_Node"],
+                                                     key="filter_labels")
+            category_names = fetch_category_names(driver, graph_version)
+            filter_category = category_column.selectbox("Root category", ["All"] + category_names, key="filter_category")
+            filter_depth = depth_column.number_input("Max depth", min_value=1, value=FILTER_MAX_DEPTH, key="filter_depth")
+        graph_cache = get_graph_cache(*graph_load_mode(progressive))
+        focus_node = st.session_state.get('focus_node')
+        with profile_phase(profiler, "load_graph"):
+            if focus_node:
+                # Jumped to from search: only the node's path to the root and its children are drawn
+                records = memo_view('focus_view', (focus_node, graph_version),
+                                    lambda: fetch_neighbourhood(driver, focus_node))
+            elif filtering:
+                filter_key = (tuple(filter_statuses), tuple(filter_labels),
+                              None if filter_category == "All" else filter_category, int(filter_depth), graph_version)
+                records = memo_view('filter_view', filter_key, lambda: fetch_filtered_graph(driver, *filter_key))
+            else:
+                records = load_graph_records(driver, graph_cache, progressive=progressive,
+                                             expanded=st.session_state.expanded_nodes, version=graph_version)
+                graph_version = graph_cache.version
+        if focus_node and (not records or st.button("Show Full Graph")):
+            # An empty neighbourhood means the node has been deleted since the jump
+            st.session_state.focus_node = None
+            st.rerun()
+        if collapse and records:
+            def roll_up():
+                with profile_phase(profiler, "rollup"):
+                    return rollup_records(driver, records, graph_version, st.session_state.expanded_nodes,
+                                          collapse_depth, collapse_threshold)
+            rollup_key = (collapse_depth, collapse_threshold, graph_version, frozenset(st.session_state.expanded_nodes))
+            records = memo_view('rollup_view', rollup_key, roll_up, source=records)
+        if st.session_state.pending_edits and records:
+            # Draw queued write-behind edits before they reach the database
+            pending_key = tuple((node_id, tuple(edit['props'].items()))
+                                for node_id, edit in st.session_state.pending_edits.items())
+            records = memo_view('pending_view', pending_key,
+                                lambda: overlay_pending_edits(records, st.session_state.pending_edits), source=records)
+        if not records and filtering and not focus_node:
+            st.info("No nodes match the filters.")
+        elif not records:
             st.warning("No data found in the database. Please set up the database to see the graph.")
         else:
-            clicked_node = draw_graph(records)
+            with profile_phase(profiler, "draw_graph"):
+                clicked_node = draw_graph(records, precomputed_layout=precomputed_layout,
+                                          highlighted_ids=st.session_state.bulk_selection)
+            if auto_refresh:
+                watch_graph_version(driver, graph_version)
             # If a new node is clicked, update the session state and rerun
-            # to trigger the sidebar form to populate.
-            if clicked_node and clicked_node != st.session_state.get('selected_node'):
+            # to trigger the sidebar form to populate and load the node's children.
+            if clicked_node and clicked_node.startswith(SUMMARY_NODE_PREFIX):
+                # A summary node is not editable; clicking it expands the subtree it stands for
+                st.session_state.expanded_nodes.add(clicked_node[len(SUMMARY_NODE_PREFIX):])
+                st.rerun()
+            elif clicked_node and multi_select:
+                # agraph keeps returning the last clicked node, so only react to a new click
+                if clicked_node != st.session_state.get('last_bulk_click'):
+                    st.session_state.last_bulk_click = clicked_node
+                    st.session_state.bulk_selection ^= {clicked_node}
+                    st.rerun()
+            elif clicked_node and clicked_node != st.session_state.get('selected_node'):
                 st.session_state.selected_node = clicked_node
+                st.session_state.expanded_nodes.add(clicked_node)
+                if focus_node:
+                    # Move the neighbourhood view along with the selection
+                    st.session_state.focus_node = clicked_node
                 st.rerun()
 
+    # Drawn last so it shows the phases of the run that is just finishing
+    render_profiling_panel(profiler)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
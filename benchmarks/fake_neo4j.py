@@ -0,0 +1,540 @@
+"""
+An in-memory stand-in for the parts of the neo4j driver that app.py and todo_db.py use.
+
+It understands the fixed set of queries they issue (matched on their text) and answers
+them from a Python graph, so the app's own code paths can be timed without a database.
+Statements it does not recognise (for example the lines of a .cql script) are accepted and
+return no rows. Every `run` is counted as one round trip.
+"""
+import itertools
+import re
+import time
+from collections.abc import Mapping
+
+TREE_RELATIONSHIPS = ("HAS_TASK_TYPE", "HAS_TASK", "HAS_SUBTASK")
+
+
+class FakeNode(Mapping):
+    """Mimics neo4j.graph.Node: a property mapping with element_id and labels."""
+
+    def __init__(self, element_id, labels, properties):
+        self.element_id = element_id
+        self.labels = frozenset(labels)
+        self._properties = properties
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __iter__(self):
+        return iter(self._properties)
+
+    def __len__(self):
+        return len(self._properties)
+
+
+class FakeRelationship(Mapping):
+    """Mimics neo4j.graph.Relationship: a property mapping with a type."""
+
+    def __init__(self, rel_type, properties=None):
+        self.type = rel_type
+        self._properties = properties or {}
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __iter__(self):
+        return iter(self._properties)
+
+    def __len__(self):
+        return len(self._properties)
+
+
+class FakeCounters:
+    def __init__(self, nodes_created=0, nodes_deleted=0, relationships_created=0, properties_set=0):
+        self.nodes_created = nodes_created
+        self.nodes_deleted = nodes_deleted
+        self.relationships_created = relationships_created
+        self.properties_set = properties_set
+
+
+class FakeSummary:
+    def __init__(self, query, parameters, counters):
+        self.query = query
+        self.parameters = parameters
+        self.counters = counters
+        # Server timings are not modelled
+        self.result_available_after = 0
+        self.result_consumed_after = 0
+
+
+class FakeResult:
+    """Mimics neo4j.Result: iterable of dict records with single() and consume()."""
+
+    def __init__(self, rows, summary):
+        self._rows = rows
+        self._summary = summary
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def single(self):
+        return self._rows[0] if self._rows else None
+
+    def data(self):
+        return [dict(row) for row in self._rows]
+
+    def consume(self):
+        return self._summary
+
+
+class FakeGraph:
+    """Nodes, tree relationships and the _GraphVersion marker."""
+
+    def __init__(self):
+        self.nodes = {} # element id -> {"labels": [...], "props": {...}}
+        self.out_edges = {} # element id -> [(type, target id)]
+        self.in_edges = {} # element id -> [(type, source id)]
+        self.version = None
+        self.by_name = {} # (label, name) -> set of element ids, standing in for the name indexes
+        self._next_id = 0
+
+    def add_node(self, labels, props):
+        element_id = f"4:fake:{self._next_id}"
+        self._next_id += 1
+        self.nodes[element_id] = {"labels": list(labels), "props": dict(props)}
+        self.out_edges[element_id] = []
+        self.in_edges[element_id] = []
+        self._index(element_id)
+        return element_id
+
+    def _index(self, element_id, remove=False):
+        node = self.nodes[element_id]
+        for label in node["labels"]:
+            ids = self.by_name.setdefault((label, node["props"].get("name")), set())
+            ids.discard(element_id) if remove else ids.add(element_id)
+
+    def update_node(self, element_id, props):
+        self._index(element_id, remove=True)
+        self.nodes[element_id]["props"].update(props)
+        self._index(element_id)
+
+    def replace_node(self, element_id, labels, props):
+        self._index(element_id, remove=True)
+        self.nodes[element_id] = {"labels": list(labels), "props": dict(props)}
+        self._index(element_id)
+
+    def add_edge(self, source_id, rel_type, target_id):
+        self.out_edges[source_id].append((rel_type, target_id))
+        self.in_edges[target_id].append((rel_type, source_id))
+
+    def remove_node(self, element_id):
+        for rel_type, target_id in self.out_edges.pop(element_id, []):
+            self.in_edges[target_id].remove((rel_type, element_id))
+        for rel_type, source_id in self.in_edges.pop(element_id, []):
+            self.out_edges[source_id].remove((rel_type, element_id))
+        if element_id in self.nodes:
+            self._index(element_id, remove=True)
+            del self.nodes[element_id]
+
+    def find_by_name(self, labels, name):
+        found = set()
+        for label in labels:
+            found |= self.by_name.get((label, name), set())
+        return sorted(found)
+
+    def descendants(self, element_id, include_self=True):
+        seen = {element_id} if include_self else set()
+        stack = [element_id]
+        while stack:
+            for rel_type, target_id in self.out_edges.get(stack.pop(), ()):
+                if rel_type in TREE_RELATIONSHIPS and target_id not in seen:
+                    seen.add(target_id)
+                    stack.append(target_id)
+        return seen
+
+    def node_object(self, element_id):
+        node = self.nodes[element_id]
+        return FakeNode(element_id, node["labels"], node["props"])
+
+    def slim(self, element_id):
+        props = self.nodes[element_id]["props"]
+        return {"name": props.get("name"), "status": props.get("status")}
+
+    def edges(self):
+        for source_id, out in self.out_edges.items():
+            for rel_type, target_id in out:
+                yield source_id, rel_type, target_id
+
+
+class FakeTransaction:
+    def __init__(self, session):
+        self._session = session
+        self.closed = False
+
+    def run(self, query, parameters=None, **kwargs):
+        return self._session._execute(query, {**(parameters or {}), **kwargs})
+
+    def commit(self):
+        self._session.driver.stats["commits"] += 1
+        self.closed = True
+
+    def rollback(self):
+        self._session.driver.stats["rollbacks"] += 1
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.closed:
+            self.rollback() if exc_type else self.commit()
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+        self.graph = driver.graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, query, parameters=None, **kwargs):
+        self.driver.stats["autocommit"] += 1
+        return self._execute(query, {**(parameters or {}), **kwargs})
+
+    def begin_transaction(self):
+        self.driver.stats["transactions"] += 1
+        return FakeTransaction(self)
+
+    def execute_read(self, transaction_function, *args, **kwargs):
+        return self._execute_managed(transaction_function, args, kwargs)
+
+    def execute_write(self, transaction_function, *args, **kwargs):
+        return self._execute_managed(transaction_function, args, kwargs)
+
+    def _execute_managed(self, transaction_function, args, kwargs):
+        # Like the real driver minus the retries: commit on return, roll back on error
+        with self.begin_transaction() as tx:
+            return transaction_function(tx, *args, **kwargs)
+
+    def _execute(self, query, params):
+        self.driver.stats["round_trips"] += 1
+        self.driver.queries.append(query)
+        rows, counters = self._dispatch(query, params)
+        if "MERGE (_v:_GraphVersion" in query:
+            # Mirrors with_version_bump: every returned row carries the versions around one bump;
+            # a bump with a WHERE condition returns no row, and does not bump, when nothing changed
+            conditional = re.search(r"WHERE \S+ > 0 MERGE \(_v:", query)
+            for row in rows or ([] if conditional else [{}]):
+                row["previous_version"] = self.graph.version
+                self.graph.version = (self.graph.version or 0) + 1
+                row["version"] = self.graph.version
+        return FakeResult(rows, FakeSummary(query, params, counters))
+
+    @staticmethod
+    def _ancestors(parents, node_id):
+        yield node_id
+        while node_id in parents:
+            node_id = parents[node_id][1]
+            yield node_id
+
+    def _dispatch(self, query, params):
+        graph = self.graph
+        counters = FakeCounters()
+
+        if "(v:_GraphVersion" in query:
+            if "MERGE" in query and graph.version is None:
+                graph.version = 1
+            return ([{"version": graph.version, "epoch": 1, "now": int(time.time() * 1000)}]
+                    if graph.version is not None else []), counters
+
+        if "RETURN n, r, m" in query:
+            limit = re.search(r"LIMIT (\d+)", query)
+            edges = itertools.islice(graph.edges(), int(limit.group(1)) if limit else None)
+            return [{"n": graph.node_object(source_id), "r": FakeRelationship(rel_type), "m": graph.node_object(target_id)}
+                    for source_id, rel_type, target_id in edges], counters
+
+        if "MATCH (c:Task_Category) RETURN c.name AS name" in query:
+            return sorted(({"name": node["props"].get("name")} for node in graph.nodes.values()
+                           if "Task_Category" in node["labels"]), key=lambda row: row["name"]), counters
+
+        if "db.index.fulltext.queryNodes" in query:
+            # A scan standing in for the full-text index: every term must appear in the name
+            terms = [term.rstrip("*").replace("\\", "") for term in params["query"].split(" AND ")]
+            matches = (node_id for node_id, node in graph.nodes.items()
+                       if all(term in str(node["props"].get("name", "")).lower() for term in terms))
+            return [{"id": node_id, "labels": graph.nodes[node_id]["labels"], "name": graph.nodes[node_id]["props"].get("name"),
+                     "status": graph.nodes[node_id]["props"].get("status"), "score": 1.0}
+                    for node_id in itertools.islice(matches, params["limit"])], counters
+
+        if "AS source_id" in query and "UNWIND relationships(" in query:
+            # Walk down from the Start_Node (or the category), keeping the paths to matching nodes
+            statuses, labels = params.get("statuses"), params.get("labels")
+            frontier = [(node_id, 0) for node_id, node in graph.nodes.items() if "Start_Node" in node["labels"]]
+            parents = {}
+            edges = set()
+            while frontier:
+                node_id, depth = frontier.pop()
+                node = graph.nodes[node_id]
+                under_category = not params.get("category") or any(
+                    "Task_Category" in graph.nodes[ancestor]["labels"]
+                    and graph.nodes[ancestor]["props"].get("name") == params["category"]
+                    for ancestor in self._ancestors(parents, node_id))
+                if (depth and under_category and (not statuses or node["props"].get("status") in statuses)
+                        and (not labels or set(node["labels"]) & set(labels))):
+                    child_id = node_id
+                    while child_id in parents:
+                        rel_type, parent_id = parents[child_id]
+                        edges.add((rel_type, parent_id, child_id))
+                        child_id = parent_id
+                if depth < params["max_depth"]:
+                    for rel_type, child_id in graph.out_edges[node_id]:
+                        if rel_type in TREE_RELATIONSHIPS:
+                            parents[child_id] = (rel_type, node_id)
+                            frontier.append((child_id, depth + 1))
+            return [{"source_id": source_id, "source_labels": graph.nodes[source_id]["labels"], "source_props": graph.slim(source_id),
+                     "target_id": child_id, "target_labels": graph.nodes[child_id]["labels"], "target_props": graph.slim(child_id),
+                     "type": rel_type}
+                    for rel_type, source_id, child_id in edges], counters
+
+        if "AS source_id" in query and "(target)" in query:
+            target_id = params["node_id"]
+            if target_id not in graph.nodes:
+                return [], counters
+            edges = [(rel_type, target_id, child_id) for rel_type, child_id in graph.out_edges[target_id]
+                     if rel_type in TREE_RELATIONSHIPS]
+            node_id = target_id
+            while graph.in_edges[node_id]:
+                rel_type, parent_id = next(iter(graph.in_edges[node_id]))
+                edges.append((rel_type, parent_id, node_id))
+                node_id = parent_id
+            return [{"source_id": source_id, "source_labels": graph.nodes[source_id]["labels"], "source_props": graph.slim(source_id),
+                     "target_id": child_id, "target_labels": graph.nodes[child_id]["labels"], "target_props": graph.slim(child_id),
+                     "type": rel_type}
+                    for rel_type, source_id, child_id in edges], counters
+
+        if "AS source_id" in query:
+            if "root:Start_Node" in query:
+                depth = int(re.search(r"\*0\.\.(\d+)", query).group(1)) + 1
+                frontier = [node_id for node_id, node in graph.nodes.items() if "Start_Node" in node["labels"]]
+                sources = []
+                for _ in range(depth):
+                    sources.extend(frontier)
+                    frontier = [target_id for node_id in frontier for rel_type, target_id in graph.out_edges[node_id]
+                                if rel_type in TREE_RELATIONSHIPS]
+            else:
+                sources = [node_id for node_id in params["node_ids"] if node_id in graph.nodes]
+            rows = [{"source_id": source_id, "source_labels": graph.nodes[source_id]["labels"], "source_props": graph.slim(source_id),
+                     "target_id": target_id, "target_labels": graph.nodes[target_id]["labels"], "target_props": graph.slim(target_id),
+                     "type": rel_type}
+                    for source_id in sources for rel_type, target_id in graph.out_edges[source_id]
+                    if rel_type in TREE_RELATIONSHIPS]
+            return rows, counters
+
+        if "RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props" in query:
+            return [{"id": node_id, "labels": node["labels"], "props": dict(node["props"])}
+                    for node_id, node in graph.nodes.items()], counters
+
+        if "AS source, elementId(b) AS target" in query:
+            return [{"source": source_id, "target": target_id, "type": rel_type, "props": {}}
+                    for source_id, rel_type, target_id in graph.edges()], counters
+
+        if "RETURN n" in query and "WHERE NOT n:" in query:
+            return [{"n": graph.node_object(node_id)} for node_id in graph.nodes], counters
+
+        if "RETURN properties(n) AS props" in query and "SET" not in query:
+            node = graph.nodes.get(params["node_id"])
+            return ([{"props": dict(node["props"])}] if node else []), counters
+
+        if "SET n += $props" in query:
+            node = graph.nodes.get(params["node_id"])
+            if node is None:
+                return [], counters
+            graph.update_node(params["node_id"], params["props"])
+            counters.properties_set = len(params["props"])
+            return [{"props": dict(node["props"])}], counters
+
+        if "UNWIND $edits AS edit" in query:
+            applied, rejected = [], []
+            for edit in params["edits"]:
+                node = graph.nodes.get(edit["id"])
+                conflicts = (["(deleted)"] if node is None else
+                             [key for key, value in edit["base"].items() if node["props"].get(key) != value])
+                if conflicts:
+                    rejected.append([edit["id"], conflicts])
+                else:
+                    graph.update_node(edit["id"], edit["props"])
+                    applied.append([edit["id"], dict(node["props"])])
+            return [{"applied": applied, "rejected": rejected}], counters
+
+        if "elementId(n) = $node_id" in query and "DETACH DELETE n" in query:
+            deleted = int(params["node_id"] in graph.nodes)
+            graph.remove_node(params["node_id"])
+            counters.nodes_deleted = deleted
+            return ([{"deleted": deleted}] if deleted else []), counters
+
+        if "RETURN count(p) AS parents" in query:
+            name = params.get("parent_node_name", params.get("parent_name"))
+            return [{"parents": len(graph.find_by_name(_parent_labels(query), name))}], counters
+
+        if "$parent_node_name" in query and "CREATE (n:" in query:
+            parents = graph.find_by_name(_parent_labels(query), params["parent_node_name"])
+            if len(parents) != 1:
+                return [], counters
+            label = re.search(r"CREATE \(n:(\w+)", query).group(1)
+            rel_type = re.search(r"CREATE \(p\)-\[:`(\w+)`\]", query).group(1)
+            node_id = graph.add_node([label], {"name": params["node_name"], "status": "Planning"})
+            graph.add_edge(parents[0], rel_type, node_id)
+            counters.nodes_created, counters.relationships_created = 1, 1
+            node = graph.nodes[node_id]
+            return [{"parent_id": parents[0], "id": node_id, "labels": node["labels"], "props": dict(node["props"])}], counters
+
+        if "UNWIND $node_ids AS node_id" in query:
+            rows = []
+            for node_id in params["node_ids"]:
+                statuses = {}
+                for descendant in graph.descendants(node_id, include_self=False) if node_id in graph.nodes else ():
+                    status = graph.nodes[descendant]["props"].get("status") or "Unknown"
+                    statuses[status] = statuses.get(status, 0) + 1
+                if statuses:
+                    rows.append({"node_id": node_id, "counts": [[status, count] for status, count in statuses.items()]})
+            return rows, counters
+
+        if "SET d.status = $status" in query:
+            updated = set()
+            for root_id in params["node_ids"]:
+                if root_id in graph.nodes:
+                    updated |= graph.descendants(root_id)
+            for node_id in updated:
+                graph.nodes[node_id]["props"]["status"] = params["status"]
+            return [{"updated": sorted(updated)}], counters
+
+        if "DETACH DELETE d" in query:
+            deleted = set()
+            for root_id in params["node_ids"]:
+                if root_id in graph.nodes:
+                    deleted |= graph.descendants(root_id)
+            for node_id in deleted:
+                graph.remove_node(node_id)
+            counters.nodes_deleted = len(deleted)
+            return ([{"deleted": sorted(deleted)}] if deleted else []), counters
+
+        if "| DELETE old)" in query:
+            parents = graph.find_by_name(_parent_labels(query), params["parent_name"])
+            moved, rejected = 0, []
+            if len(parents) == 1:
+                below_selection = set().union(*(graph.descendants(node_id, include_self=False)
+                                                for node_id in params["node_ids"] if node_id in graph.nodes))
+                for node_id in params["node_ids"]:
+                    node = graph.nodes.get(node_id)
+                    if (node is None or "Start_Node" in node["labels"] or parents[0] in graph.descendants(node_id)
+                            or node_id in below_selection):
+                        continue
+                    old = list(graph.in_edges[node_id])
+                    rel_type = old[0][0] if old else "HAS_TASK"
+                    if not set(graph.nodes[parents[0]]["labels"]) & set(params["parent_labels"][rel_type]):
+                        rejected.append(node["props"].get("name"))
+                        continue
+                    for old_type, source_id in old:
+                        graph.out_edges[source_id].remove((old_type, node_id))
+                        graph.in_edges[node_id].remove((old_type, source_id))
+                    graph.add_edge(parents[0], rel_type, node_id)
+                    moved += 1
+            return [{"moved": moved, "rejected": rejected}], counters
+
+        if "UNWIND $rows AS row" in query and "row.parent" in query:
+            label = re.search(r"CREATE \(n:(\w+)", query).group(1)
+            rel_type = re.search(r"CREATE \(p\)-\[:`(\w+)`\]", query).group(1)
+            parent_labels = _parent_labels(query)
+            rows = []
+            for row in params["rows"]:
+                parents = graph.find_by_name(parent_labels, row["parent"])
+                if len(parents) != 1:
+                    continue
+                if graph.find_by_name([label], row["name"]):
+                    raise RuntimeError(f"Node({label}) already exists with name '{row['name']}'")
+                node_id = graph.add_node([label], {"name": row["name"], "status": row["status"]})
+                graph.add_edge(parents[0], rel_type, node_id)
+                rows.append({"row": row["row"]})
+            counters.nodes_created = counters.relationships_created = len(rows)
+            return rows, counters
+
+        if query == "MATCH (n) DETACH DELETE n":
+            for node_id in list(graph.nodes):
+                graph.remove_node(node_id)
+            return [], counters
+
+        if "UNWIND $rows AS row MATCH (n:`" in query:
+            # Compact snapshot tombstones; like Cypher, every row matches before any row is written
+            label = re.search(r"\(n:`(\w+)`", query).group(1)
+            matches = [(row, graph.find_by_name([label], row["name"])) for row in params["rows"]]
+            for row, node_ids in matches:
+                for node_id in node_ids:
+                    if "SET n.name = row.renamed_to" in query:
+                        graph.update_node(node_id, {"name": row["renamed_to"]})
+                    elif node_id in graph.nodes:
+                        graph.remove_node(node_id)
+            return [], counters
+
+        if "UNWIND $rows AS row" in query and "SET n = row.props" in query:
+            # Compact snapshot nodes: CREATE in a full restore, MERGE on the key in an incremental one
+            labels = re.findall(r":`(\w+)`", query.split(" WITH ")[0])
+            for row in params["rows"]:
+                existing = graph.find_by_name(labels[:1], row["name"]) if "MERGE" in query else []
+                if existing:
+                    node_id = existing[0]
+                    graph.replace_node(node_id, set(graph.nodes[node_id]["labels"]) | set(labels), row["props"])
+                    for rel_type, source_id in list(graph.in_edges[node_id]):
+                        graph.out_edges[source_id].remove((rel_type, node_id))
+                        graph.in_edges[node_id].remove((rel_type, source_id))
+                else:
+                    graph.add_node(labels, row["props"])
+                    counters.nodes_created += 1
+            return [], counters
+
+        if "UNWIND $rows AS row" in query and "SET r = row.props" in query:
+            from_label, to_label, rel_type = re.findall(r":`(\w+)`", query)
+            for row in params["rows"]:
+                for source_id in graph.find_by_name([from_label], row["source"]):
+                    for target_id in graph.find_by_name([to_label], row["target"]):
+                        graph.add_edge(source_id, rel_type, target_id)
+                        counters.relationships_created += 1
+            return [], counters
+
+        # Schema commands, script statements and anything else: accepted, no rows
+        return [], counters
+
+
+def _parent_labels(query):
+    """Labels of the `(p:Label {name: ...})` branches of a parent lookup."""
+    return re.findall(r"\(p:(\w+) \{name:", query)
+
+
+class FakeDriver:
+    """Mimics neo4j.Driver: hands out sessions over one FakeGraph and counts round trips."""
+
+    def __init__(self, graph=None):
+        self.graph = graph if graph is not None else FakeGraph()
+        self.execute_query_bookmark_manager = None # Sessions ignore it; there is only one graph
+        self.queries = []
+        self.stats = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.queries.clear()
+        self.stats.update(round_trips=0, autocommit=0, transactions=0, commits=0, rollbacks=0)
+
+    def session(self, **config):
+        return FakeSession(self)
+
+    def verify_connectivity(self):
+        return None
+
+    def close(self):
+        pass
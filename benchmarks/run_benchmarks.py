@@ -0,0 +1,267 @@
+"""
+Times the data paths of app.py and todo_db.py against synthetic todo graphs, using FakeDriver
+instead of Neo4j.
+
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 100000 --output bench.json
+    python -m benchmarks.run_benchmarks --sizes 1000 --compare bench.json
+
+For every (case, size) it reports wall time (best of --repeat runs), Python allocations
+(peak and net bytes under tracemalloc, from a separate run) and round trips to the driver.
+Database-side cost is not modelled, so round trips are the proxy for server work.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+import app # noqa: E402
+import todo_db # noqa: E402
+from benchmarks.fake_neo4j import FakeDriver # noqa: E402
+from benchmarks.synthetic_graph import generate_todo_graph # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+WRITE_OPERATIONS = 100 # Calls per create/update/delete case
+
+
+def _quiet_streamlit():
+    """Bare-mode Streamlit warns on every cache and session_state access."""
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def _fresh_cache_state():
+    app.node_widget.cache_clear()
+    app.edge_widget.cache_clear()
+    app.st.session_state.clear()
+
+
+##================== Cases ======================
+# Each case takes (driver, ids, workdir), does any untimed setup and returns
+# (operation, operation count); only the operation is measured.
+
+def case_fetch_graph_data(driver, ids, workdir):
+    return (lambda: todo_db.fetch_graph_data(driver)), 1
+
+
+def case_fetch_subtree(driver, ids, workdir):
+    return (lambda: todo_db.fetch_subtree(driver, todo_db.GRAPH_LOAD_DEPTH)), 1
+
+
+def case_load_graph_records_cold(driver, ids, workdir):
+    return (lambda: app.load_graph_records(driver, app.GraphCache(), progressive=False)), 1
+
+
+def case_load_graph_records_warm(driver, ids, workdir):
+    graph_cache = app.GraphCache()
+    app.load_graph_records(driver, graph_cache, progressive=False)
+    return (lambda: app.load_graph_records(driver, graph_cache, progressive=False)), 1
+
+
+def _all_records(driver):
+    """The whole tree as processed records (fetch_graph_data stops at 100 edges)."""
+    return todo_db.fetch_subtree(driver, depth=len(todo_db.TREE_RELATIONSHIPS))
+
+
+def case_draw_graph_cold(driver, ids, workdir):
+    records = _all_records(driver)
+
+    def operation():
+        _fresh_cache_state()
+        app.draw_graph(records)
+    return operation, 1
+
+
+def case_draw_graph_rerun(driver, ids, workdir):
+    records = _all_records(driver)
+    _fresh_cache_state()
+    app.draw_graph(records)
+    return (lambda: app.draw_graph(records)), 1
+
+
+def case_compute_tree_layout(driver, ids, workdir):
+    records = _all_records(driver)
+    return (lambda: app.compute_tree_layout(records)), 1
+
+
+def case_snapshot_batched(driver, ids, workdir):
+    path = os.path.join(workdir, "batched.cql")
+    return (lambda: todo_db.create_database_snapshot(driver, path, mode="batched")), 1
+
+
+def case_snapshot_compact(driver, ids, workdir):
+    snapshot_dir = os.path.join(workdir, "snapshots")
+    return (lambda: todo_db.create_compact_snapshot(driver, snapshot_dir)), 1
+
+
+def case_snapshot_legacy(driver, ids, workdir):
+    path = os.path.join(workdir, "legacy.cql")
+    return (lambda: todo_db.create_database_snapshot(driver, path, mode="legacy")), 1
+
+
+def case_run_cypher_script(driver, ids, workdir):
+    path = os.path.join(workdir, "restore.cql")
+    todo_db.create_database_snapshot(driver, path, mode="batched")
+    return (lambda: todo_db.run_cypher_script(driver, path)), 1
+
+
+def case_create_node(driver, ids, workdir):
+    parents = [driver.graph.nodes[node_id]["props"]["name"] for node_id in ids["Task"][:WRITE_OPERATIONS]]
+
+    def operation():
+        for i, parent in enumerate(parents):
+            todo_db.create_node_and_relationship(driver, f"Bench SubTask {i}", parent, "HAS_SUBTASK")
+    return operation, len(parents)
+
+
+def case_update_node(driver, ids, workdir):
+    targets = ids["Task"][:WRITE_OPERATIONS]
+
+    def operation():
+        for node_id in targets:
+            todo_db.update_node_properties(driver, node_id, {"status": "InProgress"})
+    return operation, len(targets)
+
+
+def case_flush_edits(driver, ids, workdir):
+    targets = ids["Task"][:WRITE_OPERATIONS]
+
+    def operation():
+        pending_edits = {}
+        for node_id in targets:
+            props = driver.graph.nodes[node_id]["props"]
+            # Always a real change, so repeated runs keep flushing every edit
+            status = "Planning" if props.get("status") != "Planning" else "InProgress"
+            app.queue_edit(pending_edits, node_id, props, {"status": status})
+        todo_db.flush_edits(driver, pending_edits)
+    return operation, len(targets)
+
+
+def case_delete_node(driver, ids, workdir):
+    targets = ids["SubTask"][:WRITE_OPERATIONS]
+
+    def operation():
+        for node_id in targets:
+            todo_db.delete_node(driver, node_id)
+    return operation, len(targets)
+
+
+def case_import_tasks(driver, ids, workdir):
+    path = os.path.join(workdir, "import.csv")
+    parents = [driver.graph.nodes[node_id]["props"]["name"] for node_id in ids["Task"]]
+    row_count = max(1, len(ids["SubTask"]) // 10)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("name,parent,relationship_type,status\n")
+        for i in range(row_count):
+            f.write(f"Imported {i},{parents[i % len(parents)]},HAS_SUBTASK,Planning\n")
+    return (lambda: todo_db.import_tasks(driver, path)), row_count
+
+
+CASES = {name[len("case_"):]: case for name, case in sorted(globals().items()) if name.startswith("case_")}
+
+
+##================== Runner ======================
+
+def _build(size, seed):
+    driver = FakeDriver()
+    ids = generate_todo_graph(driver.graph, size, seed=seed)
+    driver.graph.version = 1 # As left behind by the app's first write
+    return driver, ids
+
+
+def run_case(name, size, repeat, seed):
+    """Runs one case `repeat` times for timing plus once under tracemalloc, each on a fresh graph."""
+    case = CASES[name]
+    best = None
+    round_trips = transactions = operations = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(repeat):
+            driver, ids = _build(size, seed)
+            operation, operations = case(driver, ids, workdir)
+            driver.reset_stats()
+            start = time.perf_counter()
+            operation()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            round_trips, transactions = driver.stats["round_trips"], driver.stats["transactions"]
+
+        driver, ids = _build(size, seed)
+        operation, operations = case(driver, ids, workdir)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        operation()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "case": name,
+        "size": size,
+        "operations": operations,
+        "wall_seconds": best,
+        "wall_seconds_per_operation": best / operations if operations else None,
+        "alloc_peak_bytes": peak - baseline,
+        "alloc_net_bytes": current - baseline,
+        "round_trips": round_trips,
+        "transactions": transactions,
+    }
+
+
+def compare(results, baseline_path):
+    """Prints wall time and round-trip ratios against a previous --output file."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(row["case"], row["size"]): row for row in json.load(f)["results"]}
+    print(f"\n{'case':<28}{'size':>8}{'wall x':>10}{'trips x':>10}")
+    for row in results:
+        before = baseline.get((row["case"], row["size"]))
+        if before is None:
+            continue
+        wall_ratio = row["wall_seconds"] / before["wall_seconds"] if before["wall_seconds"] else float("nan")
+        trip_ratio = row["round_trips"] / before["round_trips"] if before["round_trips"] else float("nan")
+        print(f"{row['case']:<28}{row['size']:>8}{wall_ratio:>10.2f}{trip_ratio:>10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Synthetic graph sizes (nodes).")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=sorted(CASES), help="Cases to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is reported.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic graph generator.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--compare", help="A previous --output file to compare against.")
+    args = parser.parse_args(argv)
+    _quiet_streamlit()
+
+    results = []
+    print(f"{'case':<28}{'size':>8}{'ops':>6}{'wall s':>10}{'peak MiB':>10}{'trips':>8}{'txs':>6}")
+    for size in args.sizes:
+        for name in args.cases:
+            row = run_case(name, size, args.repeat, args.seed)
+            results.append(row)
+            print(f"{name:<28}{size:>8}{row['operations']:>6}{row['wall_seconds']:>10.4f}"
+                  f"{row['alloc_peak_bytes'] / 2**20:>10.2f}{row['round_trips']:>8}{row['transactions']:>6}", flush=True)
+
+    if args.output:
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Generates synthetic Start_Node -> Task_Category -> Task -> SubTask todo trees.
+"""
+import random
+
+STATUSES = ["Planning", "InProgress", "Done"]
+
+
+def generate_todo_graph(graph, node_count, seed=0):
+    """
+    Fills `graph` (a FakeGraph) with a todo tree of roughly node_count nodes:
+    one Start_Node, about 1% Task_Categories, 30% Tasks and the rest SubTasks,
+    each attached to a random parent of the level above.
+    Returns the element ids per label.
+    """
+    rng = random.Random(seed)
+    category_count = max(1, node_count // 100)
+    task_count = max(1, node_count * 3 // 10)
+    subtask_count = max(0, node_count - 1 - category_count - task_count)
+
+    start_id = graph.add_node(["Start_Node"], {"name": "GenAI ToDo", "status": "Planning"})
+    ids = {"Start_Node": [start_id], "Task_Category": [], "Task": [], "SubTask": []}
+    for i in range(category_count):
+        node_id = graph.add_node(["Task_Category"], {"name": f"Category {i}", "status": rng.choice(STATUSES)})
+        graph.add_edge(start_id, "HAS_TASK_TYPE", node_id)
+        ids["Task_Category"].append(node_id)
+    for i in range(task_count):
+        node_id = graph.add_node(["Task"], {"name": f"Task {i}", "status": rng.choice(STATUSES)})
+        graph.add_edge(rng.choice(ids["Task_Category"]), "HAS_TASK", node_id)
+        ids["Task"].append(node_id)
+    for i in range(subtask_count):
+        node_id = graph.add_node(["SubTask"], {"name": f"SubTask {i}", "status": rng.choice(STATUSES)})
+        graph.add_edge(rng.choice(ids["Task"]), "HAS_SUBTASK", node_id)
+        ids["SubTask"].append(node_id)
+    return ids
@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+
+from benchmarks.fake_neo4j import FakeDriver
+from todo_db import (
+    COMPACT_SNAPSHOT_FORMAT, COMPACT_SNAPSHOT_FORMAT_VERSION, read_compact_snapshot, restore_compact_snapshot,
+    snapshot_chain,
+)
+
+
+def write_snapshot(snapshot_dir, taken_at, records, kind="full", base=None):
+    """Writes a compact snapshot file the way create_compact_snapshot does and returns its name."""
+    file_name = f"todo_snapshot_{taken_at}_{kind}.jsonl.gz"
+    header = {"type": "header", "format": COMPACT_SNAPSHOT_FORMAT, "format_version": COMPACT_SNAPSHOT_FORMAT_VERSION,
+              "kind": kind, "epoch": 1, "taken_at": taken_at, "since": None, "base": base}
+    digest = hashlib.sha256()
+    with gzip.open(os.path.join(snapshot_dir, file_name), 'wt', encoding='utf-8') as f:
+        for record in [header] + records:
+            line = json.dumps(record) + "\n"
+            digest.update(line.encode('utf-8'))
+            f.write(line)
+        f.write(json.dumps({"type": "checksum", "sha256": digest.hexdigest()}) + "\n")
+    return file_name
+
+
+def node(label, name, status="Planning"):
+    return {"type": "node", "key": [label, name], "labels": [label], "props": {"name": name, "status": status}}
+
+
+def edge(rel, source, target):
+    return {"type": "edge", "rel": rel, "from": list(source), "to": list(target), "props": {}}
+
+
+def rename(label, name, renamed_to):
+    return {"type": "tombstone", "key": [label, name], "renamed_to": renamed_to}
+
+
+def names(driver, label):
+    return sorted(node["props"]["name"] for node in driver.graph.nodes.values() if label in node["labels"])
+
+
+def test_chained_renames_replay_in_order(tmp_path):
+    full = write_snapshot(tmp_path, 1000, [node("Start_Node", "Root"), node("Task_Category", "X"),
+                                           edge("HAS_TASK_TYPE", ("Start_Node", "Root"), ("Task_Category", "X"))])
+    # X was renamed to Y and then Y to Z, and the node was touched after the last rename
+    write_snapshot(tmp_path, 2000, [rename("Task_Category", "X", "Y"), rename("Task_Category", "Y", "Z"),
+                                    node("Task_Category", "Z", "InProgress"),
+                                    edge("HAS_TASK_TYPE", ("Start_Node", "Root"), ("Task_Category", "Z"))],
+                   kind="incremental", base=full)
+    driver = FakeDriver()
+
+    success, message = restore_compact_snapshot(driver, str(tmp_path))
+
+    assert success, message
+    assert names(driver, "Task_Category") == ["Z"]
+    assert [node["props"]["status"] for node in driver.graph.nodes.values() if "Task_Category" in node["labels"]] == ["InProgress"]
+
+
+def delete(label, name):
+    return {"type": "tombstone", "key": [label, name], "renamed_to": None}
+
+
+def test_chain_starts_at_the_newest_full_snapshot(tmp_path):
+    old = write_snapshot(tmp_path, 1000, [node("Start_Node", "Root")])
+    write_snapshot(tmp_path, 2000, [], kind="incremental", base=old)
+    full = write_snapshot(tmp_path, 3000, [node("Start_Node", "Root")])
+    first = write_snapshot(tmp_path, 4000, [], kind="incremental", base=full)
+    second = write_snapshot(tmp_path, 5000, [], kind="incremental", base=first)
+
+    chain = snapshot_chain(str(tmp_path))
+
+    assert [os.path.basename(header["path"]) for header in chain] == [full, first, second]
+
+
+def test_chain_stops_at_an_incremental_whose_base_is_missing(tmp_path):
+    full = write_snapshot(tmp_path, 1000, [node("Start_Node", "Root")])
+    first = write_snapshot(tmp_path, 2000, [], kind="incremental", base=full)
+    write_snapshot(tmp_path, 3000, [], kind="incremental", base="todo_snapshot_2500_incremental.jsonl.gz")
+
+    assert [os.path.basename(header["path"]) for header in snapshot_chain(str(tmp_path))] == [full, first]
+
+
+def test_damaged_snapshot_fails_its_checksum(tmp_path):
+    full = write_snapshot(tmp_path, 1000, [node("Start_Node", "Root")])
+    path = os.path.join(tmp_path, full)
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        lines = f.readlines()
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.writelines([lines[0], lines[1].replace("Root", "Rooted"), lines[2]])
+
+    with pytest.raises(ValueError, match="failed its checksum"):
+        list(read_compact_snapshot(path))
+    success, message = restore_compact_snapshot(FakeDriver(), str(tmp_path))
+    assert not success and "no changes were made" in message
+
+
+def test_increments_replay_in_the_order_they_were_taken(tmp_path):
+    root, category = ("Start_Node", "Root"), ("Task_Category", "Category")
+    full = write_snapshot(tmp_path, 1000, [node(*root), node(*category), node("Task", "Old"),
+                                           edge("HAS_TASK_TYPE", root, category),
+                                           edge("HAS_TASK", category, ("Task", "Old"))])
+    first = write_snapshot(tmp_path, 2000, [node("Task", "New"), edge("HAS_TASK", category, ("Task", "New"))],
+                           kind="incremental", base=full)
+    # The second increment updates the task the first one created and deletes the one from the full snapshot
+    write_snapshot(tmp_path, 3000, [delete("Task", "Old"), node("Task", "New", "Done"),
+                                    edge("HAS_TASK", category, ("Task", "New"))],
+                   kind="incremental", base=first)
+    driver = FakeDriver()
+
+    success, message = restore_compact_snapshot(driver, str(tmp_path))
+
+    assert success, message
+    assert "2 incremental snapshot(s)" in message
+    assert names(driver, "Task") == ["New"]
+    task_id = driver.graph.find_by_name(["Task"], "New")[0]
+    assert driver.graph.nodes[task_id]["props"]["status"] == "Done"
+    assert driver.graph.in_edges[task_id] == [("HAS_TASK", driver.graph.find_by_name(["Task_Category"], "Category")[0])]
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.fake_neo4j import FakeDriver
+from todo_db import delete_node, delete_subtrees
+
+
+@pytest.mark.parametrize("delete", [lambda driver: delete_node(driver, "missing"),
+                                    lambda driver: delete_subtrees(driver, ["missing"])])
+def test_deleting_nothing_raises_without_moving_the_version(delete):
+    driver = FakeDriver()
+    driver.graph.version = 5
+
+    with pytest.raises(Exception, match="deleted"):
+        delete(driver)
+    assert driver.graph.version == 5
+
+
+def test_delete_moves_the_version():
+    driver = FakeDriver()
+    driver.graph.version = 5
+    node_id = driver.graph.add_node(["Task"], {"name": "a"})
+
+    assert delete_subtrees(driver, [node_id]) == 1
+    assert driver.graph.version == 6 and not driver.graph.nodes
@@ -0,0 +1,181 @@
+from app import GraphCache, load_graph_records
+from benchmarks.fake_neo4j import FakeDriver
+from todo_db import create_node_and_relationship, delete_subtrees, set_subtree_status, update_node_properties
+
+
+def node(node_id, label, name, status="Planning"):
+    return {"id": node_id, "labels": [label], "properties": {"name": name, "status": status}}
+
+
+def record(source, target, rel_type):
+    return {"source": source, "target": target, "relationship": {"type": rel_type}}
+
+
+ROOT = node("r", "Start_Node", "Root")
+CATEGORY = node("c", "Task_Category", "Category")
+TASK = node("t", "Task", "Task")
+SUBTASK = node("s", "SubTask", "SubTask")
+
+
+def filled_cache(version=10):
+    cache = GraphCache()
+    cache.replace([record(ROOT, CATEGORY, "HAS_TASK_TYPE"), record(CATEGORY, TASK, "HAS_TASK"),
+                   record(TASK, SUBTASK, "HAS_SUBTASK")], version)
+    return cache
+
+
+def names(records):
+    return sorted((item["source"]["properties"]["name"], item["target"]["properties"]["name"]) for item in records)
+
+
+def test_update_delta_rebuilds_the_records_touching_the_node():
+    cache = filled_cache()
+
+    cache.apply_update("t", {"name": "Renamed", "status": "Done"}, 10, 11)
+
+    assert cache.is_current(11)
+    assert names(cache.records()) == [("Category", "Renamed"), ("Renamed", "SubTask"), ("Root", "Category")]
+
+
+def test_status_delta_keeps_the_other_properties():
+    cache = filled_cache()
+
+    cache.apply_status(["t", "s"], "Done", 10, 11)
+
+    assert cache.nodes["t"]["properties"] == {"name": "Task", "status": "Done"}
+    assert cache.nodes["s"]["properties"]["status"] == "Done"
+
+
+def test_delete_delta_drops_the_node_and_its_edges():
+    cache = filled_cache()
+
+    cache.apply_delete(["t", "s"], 10, 11)
+
+    assert names(cache.records()) == [("Root", "Category")]
+    assert "t" not in cache.nodes and "s" not in cache.nodes
+
+
+def test_create_delta_adds_an_edge_under_the_parent():
+    cache = filled_cache()
+
+    cache.apply_create("c", node("n", "Task", "New"), "HAS_TASK", 10, 11)
+
+    assert ("Category", "New") in names(cache.records())
+
+
+def test_delta_that_does_not_follow_the_cached_version_invalidates():
+    cache = filled_cache()
+
+    # Another session wrote version 11; this delta was computed against it
+    cache.apply_update("t", {"name": "Renamed"}, 11, 12)
+
+    assert cache.version is None and not cache.is_current(12)
+    assert cache.nodes["t"]["properties"]["name"] == "Task"
+
+
+def test_view_is_the_same_list_until_the_cache_changes():
+    cache = filled_cache()
+    first = cache.view()
+
+    assert cache.view() is first
+    cache.apply_status(["s"], "Done", 10, 11)
+    assert cache.view() is not first
+
+
+def test_app_writes_patch_the_cache_without_a_reload():
+    driver = FakeDriver()
+    graph = driver.graph
+    root = graph.add_node(["Start_Node"], {"name": "Root", "status": "Planning"})
+    category = graph.add_node(["Task_Category"], {"name": "Category", "status": "Planning"})
+    graph.add_edge(root, "HAS_TASK_TYPE", category)
+    cache = GraphCache()
+    load_graph_records(driver, cache, progressive=False)
+
+    create_node_and_relationship(driver, "Write docs", "Category", "HAS_TASK", graph_cache=cache)
+    task_id = next(node_id for node_id, item in graph.nodes.items() if item["props"]["name"] == "Write docs")
+    update_node_properties(driver, task_id, {"status": "InProgress"}, graph_cache=cache)
+    set_subtree_status(driver, [category], "Done", graph_cache=cache)
+    delete_subtrees(driver, [task_id], graph_cache=cache)
+    driver.reset_stats()
+    records = load_graph_records(driver, cache, progressive=False)
+
+    assert driver.stats["round_trips"] == 1 # Only the version check
+    assert names(records) == [("Root", "Category")]
+    assert cache.nodes[category]["properties"]["status"] == "Done"
+
+
+def test_foreign_write_triggers_a_full_reload():
+    driver = FakeDriver()
+    graph = driver.graph
+    root = graph.add_node(["Start_Node"], {"name": "Root", "status": "Planning"})
+    category = graph.add_node(["Task_Category"], {"name": "Category", "status": "Planning"})
+    graph.add_edge(root, "HAS_TASK_TYPE", category)
+    cache = GraphCache()
+    load_graph_records(driver, cache, progressive=False)
+
+    # Another process writes without this cache
+    set_subtree_status(driver, [category], "Done")
+    records = load_graph_records(driver, cache, progressive=False)
+
+    assert records[0]["target"]["properties"]["status"] == "Done"
+    assert cache.is_current(graph.version)
+
+
+def deep_graph():
+    """Root -> Category -> Task -> SubTask -> Detail in the fake driver."""
+    driver = FakeDriver()
+    graph = driver.graph
+    ids = {}
+    parent = None
+    for label, name, rel_type in [("Start_Node", "Root", None), ("Task_Category", "Category", "HAS_TASK_TYPE"),
+                                  ("Task", "Task", "HAS_TASK"), ("SubTask", "SubTask", "HAS_SUBTASK"),
+                                  ("SubTask", "Detail", "HAS_SUBTASK")]:
+        ids[name] = graph.add_node([label], {"name": name, "status": "Planning"})
+        if parent is not None:
+            graph.add_edge(ids[parent], rel_type, ids[name])
+        parent = name
+    return driver, ids
+
+
+def test_progressive_view_stops_at_the_load_depth():
+    driver, ids = deep_graph()
+    cache = GraphCache()
+
+    records = load_graph_records(driver, cache, progressive=True, depth=2)
+
+    assert names(records) == [("Category", "Task"), ("Root", "Category")]
+    assert cache.mode == "progressive" and cache.load_depth == 2
+
+
+def test_expanding_a_node_merges_its_children_once():
+    driver, ids = deep_graph()
+    cache = GraphCache()
+    load_graph_records(driver, cache, progressive=True, depth=2)
+
+    records = load_graph_records(driver, cache, progressive=True, depth=2, expanded={ids["Task"]})
+    driver.reset_stats()
+    again = load_graph_records(driver, cache, progressive=True, depth=2, expanded={ids["Task"]})
+
+    assert names(records) == [("Category", "Task"), ("Root", "Category"), ("Task", "SubTask")]
+    assert again is records and driver.stats["round_trips"] == 1 # Only the version check
+    # Sessions that did not expand the node still get the shallow view
+    assert names(cache.view()) == [("Category", "Task"), ("Root", "Category")]
+
+
+def test_children_read_at_another_version_are_not_merged():
+    driver, ids = deep_graph()
+    cache = GraphCache()
+    load_graph_records(driver, cache, progressive=True, depth=2)
+
+    assert not cache.merge_children([ids["Task"]], [], cache.version + 1)
+    assert ids["Task"] not in cache.children_loaded
+
+
+def test_switching_modes_reloads_the_cache():
+    driver, ids = deep_graph()
+    cache = GraphCache()
+    load_graph_records(driver, cache, progressive=True, depth=2)
+
+    records = load_graph_records(driver, cache, progressive=False)
+
+    assert len(records) == 4 and cache.mode == "full"
@@ -0,0 +1,14 @@
+from todo_db import with_version_bump
+
+
+def test_carried_names_are_passed_explicitly():
+    fragment = with_version_bump("n", rows="collect({a: n.a, b: n.b})")
+
+    assert fragment.startswith("WITH n, collect({a: n.a, b: n.b}) AS rows MERGE ")
+    assert "WITH n, rows, _v, _v.version AS previous_version " in fragment
+
+
+def test_where_guards_the_bump():
+    fragment = with_version_bump(deleted="count(n)", where="deleted > 0")
+
+    assert fragment.startswith("WITH count(n) AS deleted WHERE deleted > 0 MERGE ")
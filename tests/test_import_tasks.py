@@ -0,0 +1,69 @@
+import io
+
+from benchmarks.fake_neo4j import FakeDriver
+from todo_db import _validate_import_row, import_tasks
+
+
+def seeded_driver():
+    driver = FakeDriver()
+    graph = driver.graph
+    root = graph.add_node(["Start_Node"], {"name": "Root", "status": "Planning"})
+    category = graph.add_node(["Task_Category"], {"name": "Category", "status": "Planning"})
+    graph.add_edge(root, "HAS_TASK_TYPE", category)
+    return driver
+
+
+def csv(*lines):
+    return io.StringIO("\n".join(["name,parent,relationship_type,status", *lines]) + "\n")
+
+
+def test_invalid_rows_are_rejected_with_a_reason():
+    seen_names = {}
+
+    assert _validate_import_row(1, {"name": " T1 ", "parent": "Category", "relationship_type": "HAS_TASK",
+                                    "status": ""}, seen_names)[0]["status"] == "Planning"
+    assert _validate_import_row(2, {"name": "", "parent": "Category", "relationship_type": "HAS_TASK"},
+                                seen_names) == (None, "name and parent are required")
+    assert "invalid relationship_type" in _validate_import_row(3, {"name": "T2", "parent": "Category",
+                                                                   "relationship_type": "OWNS"}, seen_names)[1]
+    assert "invalid status" in _validate_import_row(4, {"name": "T2", "parent": "Category", "relationship_type": "HAS_TASK",
+                                                        "status": "Someday"}, seen_names)[1]
+    assert _validate_import_row(5, {"name": "T1", "parent": "Category", "relationship_type": "HAS_TASK"},
+                                seen_names) == (None, "duplicate Task name 'T1' (first seen in row 1)")
+
+
+def test_rows_whose_parent_comes_later_are_retried():
+    driver = seeded_driver()
+    # The sub-task's parent is in the second chunk
+    source = csv("S1,T1,HAS_SUBTASK,", "T1,Category,HAS_TASK,InProgress")
+
+    created, failures = import_tasks(driver, source, file_format="csv", chunk_size=1)
+
+    assert (created, failures) == (2, [])
+    assert len(driver.graph.find_by_name(["SubTask"], "S1")) == 1
+
+
+def test_missing_parent_and_invalid_rows_are_reported():
+    driver = seeded_driver()
+    source = csv("T1,Category,HAS_TASK,", "S1,Nowhere,HAS_SUBTASK,", "T2,Category,HAS_TASK,Someday")
+
+    created, failures = import_tasks(driver, source, file_format="csv")
+
+    assert created == 1
+    assert [(row, name) for row, name, _ in failures] == [(2, "S1"), (3, "T2")]
+    assert failures[0][2] == "parent 'Nowhere' not found, or matches more than one node"
+
+
+def test_failed_batch_falls_back_to_row_by_row_writes():
+    driver = seeded_driver()
+    graph = driver.graph
+    graph.add_edge(graph.find_by_name(["Task_Category"], "Category")[0], "HAS_TASK",
+                   graph.add_node(["Task"], {"name": "Existing", "status": "Planning"}))
+    # The name already in the database fails the whole UNWIND batch
+    source = csv("Existing,Category,HAS_TASK,", "T1,Category,HAS_TASK,")
+
+    created, failures = import_tasks(driver, source, file_format="csv")
+
+    assert created == 1
+    assert [(row, name) for row, name, _ in failures] == [(1, "Existing")]
+    assert len(graph.find_by_name(["Task"], "T1")) == 1
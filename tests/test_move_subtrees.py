@@ -0,0 +1,31 @@
+from benchmarks.fake_neo4j import FakeDriver
+from todo_db import move_subtrees
+
+
+def build_tree():
+    """Root -> Category -> T1 -> S1 -> S2, and Category -> T2."""
+    driver = FakeDriver()
+    graph = driver.graph
+    ids = {name: graph.add_node([label], {"name": name, "status": "Planning"})
+           for label, name in [("Start_Node", "Root"), ("Task_Category", "Category"), ("Task", "T1"),
+                               ("Task", "T2"), ("SubTask", "S1"), ("SubTask", "S2")]}
+    for parent, rel_type, child in [("Root", "HAS_TASK_TYPE", "Category"), ("Category", "HAS_TASK", "T1"),
+                                    ("Category", "HAS_TASK", "T2"), ("T1", "HAS_SUBTASK", "S1"),
+                                    ("S1", "HAS_SUBTASK", "S2")]:
+        graph.add_edge(ids[parent], rel_type, ids[child])
+    return driver, ids
+
+
+def test_selected_descendants_move_with_their_subtree():
+    driver, ids = build_tree()
+
+    assert move_subtrees(driver, [ids["S1"], ids["S2"]], "T2") == (1, [])
+    assert driver.graph.out_edges[ids["T2"]] == [("HAS_SUBTASK", ids["S1"])]
+    assert driver.graph.out_edges[ids["S1"]] == [("HAS_SUBTASK", ids["S2"])]
+
+
+def test_parent_label_not_allowed_for_the_type_is_reported():
+    driver, ids = build_tree()
+
+    assert move_subtrees(driver, [ids["S1"], ids["S2"]], "Category") == (0, ["S1"])
+    assert driver.graph.in_edges[ids["S1"]] == [("HAS_SUBTASK", ids["T1"])]
@@ -0,0 +1,59 @@
+from todo_db import split_cypher_statements
+
+
+def test_splits_on_top_level_semicolons():
+    assert split_cypher_statements("CREATE (a);\nCREATE (b);  ;\n") == ["CREATE (a)", "CREATE (b)"]
+
+
+def test_last_statement_needs_no_semicolon():
+    assert split_cypher_statements("MATCH (n) RETURN n") == ["MATCH (n) RETURN n"]
+
+
+def test_semicolons_inside_strings_are_kept():
+    script = "CREATE (:Task {name: 'a;b'}); CREATE (:Task {name: \"c;d\"})"
+    assert split_cypher_statements(script) == ["CREATE (:Task {name: 'a;b'})", "CREATE (:Task {name: \"c;d\"})"]
+
+
+def test_escaped_quotes_do_not_end_a_string():
+    script = r"CREATE (:Task {name: 'it\'s; fine'}); CREATE (:Task {name: " + '"say \\"hi;\\""' + "})"
+    assert split_cypher_statements(script) == [r"CREATE (:Task {name: 'it\'s; fine'})",
+                                               "CREATE (:Task {name: " + '"say \\"hi;\\""' + "})"]
+
+
+def test_backtick_identifiers_with_doubled_backticks():
+    script = "MATCH (n:`odd;label``x`) RETURN n; RETURN 1"
+    assert split_cypher_statements(script) == ["MATCH (n:`odd;label``x`) RETURN n", "RETURN 1"]
+
+
+def test_line_comments_are_dropped():
+    script = "// setup; not a statement\nCREATE (a); // trailing; comment\nCREATE (b)"
+    assert split_cypher_statements(script) == ["CREATE (a)", "CREATE (b)"]
+
+
+def test_block_comments_are_dropped():
+    script = "/* header;\n spans lines */ CREATE (a); CREATE /* inline; */ (b)"
+    assert split_cypher_statements(script) == ["CREATE (a)", "CREATE   (b)"]
+
+
+def test_dropped_comments_still_separate_tokens():
+    assert split_cypher_statements("RETURN 1/*x*/AS y") == ["RETURN 1 AS y"]
+    assert split_cypher_statements("RETURN 1//x\nAS y") == ["RETURN 1 \nAS y"]
+
+
+def test_comment_markers_inside_strings_are_text():
+    script = "CREATE (:Task {url: 'http://x/*y*/'}); RETURN 2 / 1"
+    assert split_cypher_statements(script) == ["CREATE (:Task {url: 'http://x/*y*/'})", "RETURN 2 / 1"]
+
+
+def test_unterminated_literals_run_to_the_end():
+    assert split_cypher_statements("RETURN 1; RETURN 'open; string") == ["RETURN 1", "RETURN 'open; string"]
+    assert split_cypher_statements("RETURN 1; RETURN `open; name") == ["RETURN 1", "RETURN `open; name"]
+    assert split_cypher_statements("RETURN 1; RETURN 'ends in \\") == ["RETURN 1", "RETURN 'ends in \\"]
+
+
+def test_unterminated_block_comment_runs_to_the_end():
+    assert split_cypher_statements("RETURN 1; /* never; closed") == ["RETURN 1"]
+
+
+def test_empty_script():
+    assert split_cypher_statements("  \n// only a comment\n") == []
@@ -0,0 +1,64 @@
+import pytest
+
+import todo_cli
+import todo_db
+from benchmarks.fake_neo4j import FakeDriver
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    driver = FakeDriver()
+    graph = driver.graph
+    root = graph.add_node(["Start_Node"], {"name": "Root", "status": "Planning"})
+    category = graph.add_node(["Task_Category"], {"name": "Category", "status": "Planning"})
+    graph.add_edge(root, "HAS_TASK_TYPE", category)
+    monkeypatch.setattr(todo_db, "create_driver", lambda: driver)
+    return driver
+
+
+def write_csv(tmp_path, *lines):
+    path = tmp_path / "tasks.csv"
+    path.write_text("\n".join(["name,parent,relationship_type,status", *lines]) + "\n")
+    return str(path)
+
+
+def test_successful_import_exits_0(driver, tmp_path, capsys):
+    assert todo_cli.main(["--quiet", "import", write_csv(tmp_path, "T1,Category,HAS_TASK,")]) == todo_cli.EXIT_OK
+    assert "Imported 1 nodes; 0 rows rejected." in capsys.readouterr().out
+
+
+def test_import_with_rejected_rows_exits_4(driver, tmp_path, capsys):
+    path = write_csv(tmp_path, "T1,Category,HAS_TASK,", "S1,Nowhere,HAS_SUBTASK,")
+
+    assert todo_cli.main(["--quiet", "import", path]) == todo_cli.EXIT_PARTIAL
+    assert "Row 2 (S1)" in capsys.readouterr().err
+
+
+def test_failed_operation_exits_1(driver, tmp_path, capsys):
+    assert todo_cli.main(["import", str(tmp_path / "missing.csv")]) == todo_cli.EXIT_FAILED
+    assert "import failed" in capsys.readouterr().err
+
+
+def test_restore_with_no_snapshot_exits_1(driver, tmp_path):
+    assert todo_cli.main(["--quiet", "restore", "--yes", "--dir", str(tmp_path)]) == todo_cli.EXIT_FAILED
+
+
+@pytest.mark.parametrize("argv", [["reset"], ["restore"], ["import", "tasks.csv", "--workers", "0"]])
+def test_destructive_commands_without_yes_and_bad_sizes_exit_2(driver, argv):
+    assert todo_cli.main(argv) == todo_cli.EXIT_USAGE
+    assert not driver.queries
+
+
+def test_unknown_command_exits_2():
+    with pytest.raises(SystemExit) as exit_info:
+        todo_cli.main(["compact"])
+    assert exit_info.value.code == todo_cli.EXIT_USAGE
+
+
+def test_unreachable_database_exits_3(monkeypatch, capsys):
+    def refuse():
+        raise ConnectionError("connection refused")
+    monkeypatch.setattr(todo_db, "create_driver", refuse)
+
+    assert todo_cli.main(["snapshot"]) == todo_cli.EXIT_UNREACHABLE
+    assert "Could not connect to Neo4j" in capsys.readouterr().err
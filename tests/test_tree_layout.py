@@ -0,0 +1,23 @@
+from app import LAYOUT_LEVEL_SPACING, compute_tree_layout
+
+
+def edge(source, target, rel_type="HAS_TASK"):
+    return {"source": {"id": source}, "target": {"id": target}, "relationship": {"type": rel_type}}
+
+
+def test_new_nodes_are_placed_below_their_parent():
+    previous = compute_tree_layout([edge("R", "A"), edge("A", "B")])
+
+    # C is seen (as D's parent) before the edge that puts it under A
+    positions = compute_tree_layout([edge("C", "D"), edge("R", "A"), edge("A", "B"), edge("A", "C")], previous)
+
+    assert {node_id: positions[node_id] for node_id in previous} == previous
+    assert positions["C"][1] == 2 * LAYOUT_LEVEL_SPACING
+    assert positions["D"][1] == 3 * LAYOUT_LEVEL_SPACING
+
+
+def test_mostly_new_graph_is_laid_out_afresh():
+    previous = compute_tree_layout([edge("R", "A")])
+    records = [edge("R", "A")] + [edge("A", f"T{index}") for index in range(6)]
+
+    assert compute_tree_layout(records, previous) == compute_tree_layout(records)
@@ -0,0 +1,67 @@
+from app import GraphCache, load_graph_records, queue_edit
+from benchmarks.fake_neo4j import FakeDriver
+from todo_db import DELETED_CONFLICT, flush_edits
+
+
+def three_tasks():
+    """Root -> Category -> T1, T2, T3 in the fake driver, loaded into a GraphCache."""
+    driver = FakeDriver()
+    graph = driver.graph
+    root = graph.add_node(["Start_Node"], {"name": "Root", "status": "Planning"})
+    category = graph.add_node(["Task_Category"], {"name": "Category", "status": "Planning"})
+    graph.add_edge(root, "HAS_TASK_TYPE", category)
+    ids = {}
+    for name in ["T1", "T2", "T3"]:
+        ids[name] = graph.add_node(["Task"], {"name": name, "status": "Planning"})
+        graph.add_edge(category, "HAS_TASK", ids[name])
+    cache = GraphCache()
+    load_graph_records(driver, cache, progressive=False)
+    return driver, cache, ids
+
+
+def test_setting_a_key_back_after_the_database_moved_is_kept():
+    pending = {}
+    queue_edit(pending, "n1", {"name": "A", "status": "Planning"}, {"status": "InProgress"})
+    # Someone else set the status to Done; the user now picks the original value again
+    queue_edit(pending, "n1", {"name": "A", "status": "Done"}, {"status": "Planning"})
+
+    assert pending["n1"]["base"] == {"status": "Planning"}
+    assert pending["n1"]["props"] == {"status": "Planning"}
+
+
+def test_setting_a_key_to_the_current_database_value_drops_it():
+    pending = {}
+    queue_edit(pending, "n1", {"name": "A", "status": "Planning"}, {"status": "InProgress"})
+    queue_edit(pending, "n1", {"name": "A", "status": "Planning"}, {"status": "Planning"})
+
+    assert pending == {}
+
+
+def test_flush_applies_edits_and_reports_conflicts():
+    driver, cache, ids = three_tasks()
+    graph = driver.graph
+    pending = {}
+    for name in ["T1", "T2", "T3"]:
+        queue_edit(pending, ids[name], dict(graph.nodes[ids[name]]["props"]), {"status": "Done"})
+    # Another session changes T2's status and deletes T3 before the flush
+    graph.update_node(ids["T2"], {"status": "InProgress"})
+    graph.remove_node(ids["T3"])
+
+    applied, conflicts = flush_edits(driver, pending, graph_cache=cache)
+
+    assert applied == [ids["T1"]]
+    assert conflicts == {ids["T2"]: ["status"], ids["T3"]: [DELETED_CONFLICT]}
+    assert graph.nodes[ids["T1"]]["props"]["status"] == "Done"
+    assert cache.nodes[ids["T1"]]["properties"]["status"] == "Done"
+    assert graph.nodes[ids["T2"]]["props"]["status"] == "InProgress"
+
+
+def test_edit_to_an_untouched_key_is_not_a_conflict():
+    driver, cache, ids = three_tasks()
+    graph = driver.graph
+    pending = {}
+    queue_edit(pending, ids["T1"], dict(graph.nodes[ids["T1"]]["props"]), {"status": "Done"})
+    graph.update_node(ids["T1"], {"name": "Renamed"})
+
+    assert flush_edits(driver, pending) == ([ids["T1"]], {})
+    assert graph.nodes[ids["T1"]]["props"] == {"name": "Renamed", "status": "Done"}
@@ -0,0 +1,152 @@
+"""
+Command-line maintenance for the ToDo graph, run outside the Streamlit process (e.g. from cron):
+
+    python todo_cli.py snapshot [--format compact|cypher] [--incremental]
+    python todo_cli.py restore --yes [--format compact|cypher]
+    python todo_cli.py import tasks.csv [--batch-size 1000] [--workers 4]
+    python todo_cli.py reset --yes
+
+Progress goes to stderr and the result to stdout. Exit codes: 0 success, 1 the operation
+failed, 2 bad arguments, 3 Neo4j could not be reached, 4 an import finished but rejected rows.
+"""
+import argparse
+import os
+import sys
+import todo_db
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2 # Also what argparse exits with on bad arguments
+EXIT_UNREACHABLE = 3
+EXIT_PARTIAL = 4
+CQL_SCRIPT_DIR = os.path.join(os.path.dirname(__file__), 'cql_scripts')
+CYPHER_SNAPSHOT_PATH = os.path.join(CQL_SCRIPT_DIR, 'todo_snapshot.cql')
+RESET_SCRIPT_PATH = os.path.join(CQL_SCRIPT_DIR, 'create_todo_db.cql')
+
+def progress_printer(unit, quiet=False):
+    """Returns a progress_callback(done, total) that prints to stderr, or None when quiet."""
+    if quiet:
+        return None
+
+    def report(done, total):
+        print(f"{done} / {total} {unit}" if total is not None else f"{done} {unit}", file=sys.stderr, flush=True)
+    return report
+
+def run_snapshot(driver, args):
+    """Writes a compact or Cypher snapshot."""
+    if args.format == "compact":
+        success, message = todo_db.create_compact_snapshot(driver, args.dir, incremental=args.incremental,
+                                                           progress_callback=progress_printer("records", args.quiet))
+    else:
+        success, message = todo_db.create_database_snapshot(driver, args.path,
+                                                            batch_size=args.batch_size or todo_db.SNAPSHOT_BATCH_SIZE)
+    return (EXIT_OK if success else EXIT_FAILED), message
+
+def run_restore(driver, args):
+    """Restores the latest compact snapshot chain, or loads a Cypher snapshot."""
+    if args.format == "compact":
+        success, message = todo_db.restore_compact_snapshot(driver, args.dir,
+                                                            progress_callback=progress_printer("files", args.quiet),
+                                                            batch_size=args.batch_size or todo_db.SNAPSHOT_BATCH_SIZE)
+    else:
+        success, message = todo_db.run_cypher_script(driver, args.path, batch_size=args.batch_size,
+                                                     progress_callback=progress_printer("statements", args.quiet))
+    return (EXIT_OK if success else EXIT_FAILED), message
+
+def run_import(driver, args):
+    """Bulk-imports a file; rejected rows are listed on stderr."""
+    def report(rows_read, created):
+        print(f"{rows_read} rows read, {created} nodes created", file=sys.stderr, flush=True)
+
+    created, failures = todo_db.import_tasks(driver, args.file, file_format=args.file_format,
+                                             chunk_size=args.chunk_size, progress_callback=None if args.quiet else report,
+                                             batch_size=args.batch_size, workers=args.workers)
+    for row_number, name, reason in failures:
+        print(f"Row {row_number} ({name}): {reason}", file=sys.stderr)
+    message = f"Imported {created} nodes; {len(failures)} rows rejected."
+    return (EXIT_PARTIAL if failures else EXIT_OK), message
+
+def run_reset(driver, args):
+    """Rebuilds the graph from a Cypher script, then recreates the schema."""
+    success, message = todo_db.run_cypher_script(driver, args.script, batch_size=args.batch_size,
+                                                 progress_callback=progress_printer("statements", args.quiet))
+    if not success:
+        return EXIT_FAILED, message
+    schema_ok, schema_message = todo_db.ensure_schema(driver)
+    if not schema_ok:
+        print(schema_message, file=sys.stderr)
+    return EXIT_OK, message
+
+def build_parser():
+    """The argparse parser, one subcommand per operation."""
+    parser = argparse.ArgumentParser(description="Snapshot, restore, import and reset the ToDo graph without the UI. "
+                                                 "Connection settings are read from .env like the app.")
+    parser.add_argument("--quiet", action="store_true", help="Do not print progress.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", help="Back the graph up.")
+    snapshot.add_argument("--format", choices=["compact", "cypher"], default="compact")
+    snapshot.add_argument("--incremental", action="store_true",
+                          help="Compact only: record just the changes since the last snapshot.")
+    snapshot.add_argument("--dir", default=todo_db.COMPACT_SNAPSHOT_DIR, help="Directory of compact snapshots.")
+    snapshot.add_argument("--path", default=CYPHER_SNAPSHOT_PATH, help="Cypher snapshot file to write.")
+    snapshot.add_argument("--batch-size", type=int, help="Cypher only: rows per UNWIND statement.")
+    snapshot.set_defaults(handler=run_snapshot)
+
+    restore = commands.add_parser("restore", help="Replace the graph with the latest snapshot.")
+    restore.add_argument("--format", choices=["compact", "cypher"], default="compact")
+    restore.add_argument("--dir", default=todo_db.COMPACT_SNAPSHOT_DIR, help="Directory of compact snapshots.")
+    restore.add_argument("--path", default=CYPHER_SNAPSHOT_PATH, help="Cypher snapshot file to load.")
+    restore.add_argument("--batch-size", type=int,
+                         help="Compact: rows per UNWIND batch. Cypher: statements per transaction "
+                              "(default: the whole file in one transaction).")
+    restore.add_argument("--yes", action="store_true", help="Confirm that the current graph is deleted first.")
+    restore.set_defaults(handler=run_restore)
+
+    bulk_import = commands.add_parser("import", help="Create nodes from a CSV, JSON or JSONL file.")
+    bulk_import.add_argument("file")
+    bulk_import.add_argument("--file-format", choices=["csv", "json", "jsonl"],
+                             help="Defaults to the file's extension.")
+    bulk_import.add_argument("--chunk-size", type=int, default=todo_db.IMPORT_CHUNK_SIZE, help="Rows read at a time.")
+    bulk_import.add_argument("--batch-size", type=int,
+                             help="Rows per UNWIND transaction (default: a chunk per relationship type).")
+    bulk_import.add_argument("--workers", type=int, default=1, help="Batches written at the same time.")
+    bulk_import.set_defaults(handler=run_import)
+
+    reset = commands.add_parser("reset", help="Delete the graph and rebuild it from a Cypher script.")
+    reset.add_argument("--script", default=RESET_SCRIPT_PATH)
+    reset.add_argument("--batch-size", type=int,
+                       help="Statements per transaction (default: the whole script in one transaction).")
+    reset.add_argument("--yes", action="store_true", help="Confirm that the current graph is deleted.")
+    reset.set_defaults(handler=run_reset)
+    return parser
+
+def main(argv=None):
+    """Runs one command and returns its exit code."""
+    args = build_parser().parse_args(argv)
+    if args.command in ("restore", "reset") and not args.yes:
+        print(f"{args.command} deletes the current graph; pass --yes to go ahead.", file=sys.stderr)
+        return EXIT_USAGE
+    if any(value is not None and value < 1 for value in (getattr(args, "batch_size", None),
+                                                         getattr(args, "workers", None),
+                                                         getattr(args, "chunk_size", None))):
+        print("--batch-size, --chunk-size and --workers must be at least 1.", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        driver = todo_db.create_driver()
+    except Exception as e:
+        print(f"Could not connect to Neo4j: {e}", file=sys.stderr)
+        return EXIT_UNREACHABLE
+    try:
+        code, message = args.handler(driver, args)
+    except Exception as e:
+        # e.g. a missing or unreadable import file
+        code, message = EXIT_FAILED, f"{args.command} failed: {e}"
+    finally:
+        driver.close()
+    print(message, file=sys.stderr if code == EXIT_FAILED else sys.stdout)
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1141 @@
+"""
+Neo4j access for the ToDo graph: connection, queries, schema, scripts, snapshots and bulk import.
+Nothing here imports Streamlit, so todo_cli.py and other tooling can use it without the UI;
+app.py adds the Streamlit caches on top.
+"""
+import os
+import re
+import json
+import gzip
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import pandas as pd
+from neo4j import GraphDatabase
+
+load_dotenv()
+
+SNAPSHOT_BATCH_SIZE = 500 # Rows per UNWIND batch in batched snapshots
+SNAPSHOT_PROGRESS_INTERVAL = 10000 # Records between progress updates while writing a compact snapshot
+SNAPSHOT_KEY_LABEL = "_SnapshotNode" # Temporary label used to link relationships on restore
+SNAPSHOT_KEY_PROPERTY = "_snapshot_key"
+SNAPSHOT_KEY_INDEX = "snapshot_key_index"
+GRAPH_VERSION_LABEL = "_GraphVersion" # Singleton node whose version moves on every write
+# Pattern body of the marker; the fixed id and its uniqueness constraint stop concurrent MERGEs creating two
+GRAPH_VERSION_MARKER = f"{GRAPH_VERSION_LABEL} {{id: 1}}"
+TOMBSTONE_LABEL = "_Tombstone" # Left behind by deletes and renames so incremental snapshots can replay them
+CHANGE_TIMESTAMP_PROPERTIES = ["created_at", "updated_at"] # Set by the app on every create / update, not editable
+DELETED_CONFLICT = "(deleted)" # Conflict reported by flush_edits for a node deleted since it was edited
+COMPACT_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'cql_scripts', 'snapshots')
+COMPACT_SNAPSHOT_FORMAT = "todo-graph-snapshot"
+COMPACT_SNAPSHOT_FORMAT_VERSION = 1
+INCREMENTAL_OVERLAP_MS = 60000 # Changes this close before the previous snapshot are recorded again, covering writes in flight then
+TODO_LABELS = ["Start_Node", "Task_Category", "Task", "SubTask"]
+# Allowed relationships to a parent and the label of the node they create
+REL_TO_LABEL_MAP = {
+    "HAS_TASK": "Task",
+    "HAS_SUBTASK": "SubTask",
+    "HAS_TASK_TYPE": "Task_Category"
+}
+TASK_STATUSES = ["Planning", "InProgress", "Done"]
+IMPORT_CHUNK_SIZE = 5000 # Rows read from an import file per chunk
+# Labels a node's parent may have, per relationship type; creates, imports and moves all enforce it
+PARENT_LABELS_BY_REL = {
+    "HAS_TASK_TYPE": ["Start_Node", "Task_Category"],
+    "HAS_TASK": ["Task_Category"],
+    "HAS_SUBTASK": ["Task", "SubTask"],
+}
+FILTER_MAX_DEPTH = 6 # Default of the depth filter, in levels below the Start_Node
+GRAPH_LOAD_DEPTH = 2 # Levels below the Start_Node fetched before any node is expanded
+TREE_RELATIONSHIPS = ["HAS_TASK_TYPE", "HAS_TASK", "HAS_SUBTASK"]
+TREE_REL_PATTERN = "|".join(TREE_RELATIONSHIPS)
+SCRIPT_PROGRESS_INTERVAL = 100 # Statements between progress updates while loading a script
+SCHEMA_STATEMENT_PATTERN = re.compile(
+    r"\s*((CREATE|DROP)\s+((RANGE|TEXT|POINT|LOOKUP|FULLTEXT|VECTOR)\s+)?(INDEX|CONSTRAINT)\b|CALL\s+db\.awaitIndex)",
+    re.IGNORECASE)
+# Tokens of a Cypher script; unterminated quotes and comments run to the end of the script
+CYPHER_TOKEN_PATTERN = re.compile(r"""
+    '(?:[^'\\]|\\.)*(?:'|\\?\Z)     # single-quoted string, backslash escapes
+  | "(?:[^"\\]|\\.)*(?:"|\\?\Z)     # double-quoted string
+  | `(?:[^`]|``)*(?:`|\Z)           # backtick identifier, `` escapes a backtick
+  | //[^\n]*                        # line comment
+  | /\*(?:.*?\*/|.*\Z)              # block comment
+  | ;                                # statement separator
+  | [^'"`/;]+ | /                    # anything else
+""", re.VERBOSE | re.DOTALL)
+SEARCH_INDEX_NAME = "todo_name_fulltext" # Full-text index on `name` across TODO_LABELS
+LUCENE_SPECIAL_CHARACTERS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+# Driver and session settings, read from .env alongside NEO4J_URI / NEO4J_USERNAME / NEO4J_PASSWORD
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None # None uses the server's default database
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "100")) # Connections per server, shared by all sessions
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60")) # Seconds to wait for a free connection
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000")) # Records pulled per network round trip
+NEO4J_MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", "30")) # Seconds a managed transaction keeps retrying
+
+##================== Neo4j Connection ======================
+
+def create_driver():
+    """
+    Creates a Neo4j driver instance and checks it can reach the server, so the first
+    connection is opened at startup rather than by the first query.
+    """
+    uri = os.getenv("NEO4J_URI")
+    user = os.getenv("NEO4J_USERNAME")
+    password = os.getenv("NEO4J_PASSWORD")
+    driver = GraphDatabase.driver(uri, auth=(user, password), max_connection_lifetime=3600,
+                                  max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+                                  connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+                                  max_transaction_retry_time=NEO4J_MAX_RETRY_TIME)
+    try:
+        driver.verify_connectivity()
+    except Exception:
+        driver.close()
+        raise
+    return driver
+
+def open_session(_driver):
+    """
+    Opens a session on the configured database with the configured fetch size. Every session
+    shares the driver's bookmark manager, so a read always sees the writes made before it, even
+    on a cluster where it is routed to a different member than the write.
+    """
+    return _driver.session(database=NEO4J_DATABASE, fetch_size=NEO4J_FETCH_SIZE,
+                           bookmark_manager=_driver.execute_query_bookmark_manager)
+
+def _fetch_all(tx, query, parameters):
+    """Transaction function returning (records, summary); records are materialised inside the transaction."""
+    result = tx.run(query, parameters)
+    return list(result), result.consume()
+
+def read_query(_driver, query, /, **parameters):
+    """
+    Runs a read query as a managed transaction: it is retried on transient errors and,
+    on a cluster, routed to a reader. Returns the list of records.
+    """
+    with open_session(_driver) as session:
+        records, _ = session.execute_read(_fetch_all, query, parameters)
+    return records
+
+def write_query(_driver, query, /, **parameters):
+    """Runs a write query as a managed transaction, retried on transient errors. Returns (records, summary)."""
+    with open_session(_driver) as session:
+        return session.execute_write(_fetch_all, query, parameters)
+
+def schema_statements():
+    """
+    Idempotent schema for the todo graph. A uniqueness constraint on `name` is backed by a
+    range index, so name lookups on each label are index seeks; `status` gets its own index,
+    `updated_at` and the tombstones are indexed for incremental snapshots, and a full-text
+    index on `name` backs the sidebar search. The graph version marker's
+    fixed id is unique, so there is only ever one marker.
+    """
+    statements = []
+    for label in TODO_LABELS:
+        snake = label.lower()
+        statements.append(f"CREATE CONSTRAINT {snake}_name_unique IF NOT EXISTS "
+                          f"FOR (n:{label}) REQUIRE n.name IS UNIQUE")
+        statements.append(f"CREATE INDEX {snake}_status_index IF NOT EXISTS FOR (n:{label}) ON (n.status)")
+        statements.append(f"CREATE INDEX {snake}_updated_at_index IF NOT EXISTS FOR (n:{label}) ON (n.updated_at)")
+    statements.append(f"CREATE FULLTEXT INDEX {SEARCH_INDEX_NAME} IF NOT EXISTS "
+                      f"FOR (n:{'|'.join(TODO_LABELS)}) ON EACH [n.name]")
+    statements.append(f"CREATE INDEX tombstone_key_index IF NOT EXISTS FOR (t:{TOMBSTONE_LABEL}) ON (t.label, t.name)")
+    statements.append(f"CREATE INDEX tombstone_deleted_at_index IF NOT EXISTS FOR (t:{TOMBSTONE_LABEL}) ON (t.deleted_at)")
+    statements.append(f"CREATE CONSTRAINT graph_version_id_unique IF NOT EXISTS "
+                      f"FOR (v:{GRAPH_VERSION_LABEL}) REQUIRE v.id IS UNIQUE")
+    return statements
+
+def ensure_schema(driver):
+    """Creates the todo indexes and constraints, skipping those that already exist."""
+    failures = []
+    for statement in schema_statements():
+        try:
+            write_query(driver, statement)
+        except Exception as e:
+            # Typically existing duplicate names that block a uniqueness constraint
+            failures.append(f"{statement.split(' IF NOT EXISTS')[0]}: {e}")
+    if failures:
+        return False, "Some schema indexes or constraints could not be created: " + "; ".join(failures)
+    return True, "Schema indexes and constraints are in place."
+
+def split_cypher_statements(cql_script):
+    """
+    Splits a Cypher script into statements on top-level semicolons.
+    Semicolons inside string literals, backtick identifiers and comments are ignored,
+    and `//` / `/* */` comments are replaced by a space in the returned statements.
+    """
+    statements = []
+    current = []
+    # One regex scan instead of a Python loop per character; quoted sections and comments are single tokens
+    for match in CYPHER_TOKEN_PATTERN.finditer(cql_script):
+        token = match.group()
+        if token == ';':
+            statements.append(''.join(current).strip())
+            current = []
+        elif token.startswith(('//', '/*')):
+            # A comment still separates the tokens around it, as in `RETURN 1/*x*/AS y`
+            current.append(' ')
+        else:
+            current.append(token)
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+def is_schema_statement(query):
+    """Schema commands cannot share a transaction with data writes, so they are run on their own."""
+    return SCHEMA_STATEMENT_PATTERN.match(query) is not None
+
+def run_cypher_script(driver, file_path, batch_size=None, progress_callback=None):
+    """
+    Reads a .cql file and executes its statements inside managed write transactions.
+    With batch_size=None the whole script runs in one transaction and any failure rolls
+    the database back to where it was; otherwise a commit is issued every batch_size
+    statements. Schema statements (indexes, constraints) are committed on their own.
+    A transaction that hits a transient error is retried by the driver.
+    progress_callback(done, total) is called after every commit and every
+    SCRIPT_PROGRESS_INTERVAL statements.
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            queries = split_cypher_statements(f.read())
+    except FileNotFoundError:
+        return False, f"Error: The file {file_path} was not found."
+
+    # Group the statements into the units that are committed together
+    units = []
+    batch = []
+    for query in queries:
+        if is_schema_statement(query):
+            if batch:
+                units.append(batch)
+                batch = []
+            units.append([query])
+        else:
+            batch.append(query)
+            if batch_size and len(batch) >= batch_size:
+                units.append(batch)
+                batch = []
+    if batch:
+        units.append(batch)
+
+    total = len(queries)
+    done = 0
+    current = [0] # Index of the statement being run, for the error message
+
+    def run_unit(tx, statements):
+        for offset, query in enumerate(statements):
+            current[0] = done + offset
+            tx.run(query).consume()
+            if progress_callback and (done + offset + 1) % SCRIPT_PROGRESS_INTERVAL == 0:
+                progress_callback(done + offset + 1, total)
+
+    try:
+        with open_session(driver) as session:
+            for unit in units:
+                session.execute_write(run_unit, unit)
+                done += len(unit)
+                if progress_callback:
+                    progress_callback(done, total)
+    except Exception as e:
+        return False, f"An error occurred at statement {current[0] + 1} of {total}, uncommitted changes were rolled back: {e}"
+    try:
+        # A script does not report what it changed, so every session is told to reload
+        bump_graph_version(driver)
+    except Exception as e:
+        return True, f"Script executed successfully ({total} statements), but the graph version could not be moved: {e}"
+    return True, f"Script executed successfully ({total} statements)."
+
+# Not cached here; app.py keeps the results in its GraphCache
+def fetch_graph_data(_driver):
+    """Fetches all nodes and relationships from the graph."""
+    # This query fetches nodes and the relationships between them
+    # We limit to 100 to avoid overwhelming the browser with a very large graph
+    result = read_query(_driver, "MATCH (n)-[r]->(m) RETURN n, r, m LIMIT 100")
+    # Process data into a simple list of dicts before returning
+    processed_data = []
+    for record in result:
+        source_node = record['n']
+        target_node = record['m']
+        relationship = record['r']
+        
+        processed_data.append({
+            "source": {"id": source_node.element_id, "labels": list(source_node.labels), "properties": dict(source_node)},
+            "target": {"id": target_node.element_id, "labels": list(target_node.labels), "properties": dict(target_node)},
+            "relationship": {"type": relationship.type}
+        })
+    return processed_data
+
+def tree_record(record):
+    """Builds a processed record from a row of the slim subtree queries."""
+    return {
+        "source": {"id": record['source_id'], "labels": record['source_labels'], "properties": record['source_props']},
+        "target": {"id": record['target_id'], "labels": record['target_labels'], "properties": record['target_props']},
+        "relationship": {"type": record['type']}
+    }
+
+# Only the properties needed to draw a node are sent; the edit form fetches the full map on demand
+TREE_RECORD_RETURN = ("RETURN DISTINCT elementId(n) AS source_id, labels(n) AS source_labels, n {.name, .status} AS source_props, "
+                      "elementId(m) AS target_id, labels(m) AS target_labels, m {.name, .status} AS target_props, "
+                      "type(r) AS type")
+
+def fetch_subtree(_driver, depth=GRAPH_LOAD_DEPTH):
+    """Fetches the first `depth` levels of the todo tree below the Start_Node."""
+    depth = max(int(depth), 1)
+    result = read_query(_driver, f"MATCH (root:Start_Node)-[:{TREE_REL_PATTERN}*0..{depth - 1}]->(n)"
+                                 f"-[r:{TREE_REL_PATTERN}]->(m) " + TREE_RECORD_RETURN)
+    return [tree_record(record) for record in result]
+
+def fetch_children(_driver, node_ids):
+    """Fetches the direct children of the given nodes."""
+    result = read_query(_driver, f"MATCH (n)-[r:{TREE_REL_PATTERN}]->(m) WHERE elementId(n) IN $node_ids "
+                                 + TREE_RECORD_RETURN, node_ids=list(node_ids))
+    return [tree_record(record) for record in result]
+
+def filtered_graph_query(statuses=(), labels=(), category=None, max_depth=FILTER_MAX_DEPTH):
+    """
+    Builds the query behind fetch_filtered_graph. Filters on the last node of each path from the
+    Start_Node become parameterized WHERE conditions, and a category anchors the match on that
+    Task_Category's unique name so only its subtree is expanded. Only max_depth, a validated
+    int, is part of the query text, since variable-length bounds cannot be parameters.
+    """
+    max_depth = max(int(max_depth), 1)
+    conditions = []
+    if statuses:
+        conditions.append("m.status IN $statuses")
+    if labels:
+        conditions.append("any(label IN labels(m) WHERE label IN $labels)")
+    if category:
+        match = (f"MATCH (c:Task_Category {{name: $category}}) "
+                 f"MATCH top = (c)<-[:{TREE_REL_PATTERN}*1..{max_depth}]-(:Start_Node) "
+                 f"MATCH below = (c)-[:{TREE_REL_PATTERN}*0..{max_depth}]->(m) ")
+        conditions.append("length(top) + length(below) <= $max_depth")
+        relationships = "relationships(top) + relationships(below)"
+    else:
+        match = f"MATCH path = (:Start_Node)-[:{TREE_REL_PATTERN}*1..{max_depth}]->(m) "
+        relationships = "relationships(path)"
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    return (match + where
+            + f"UNWIND {relationships} AS r WITH DISTINCT r "
+            "WITH startNode(r) AS n, r, endNode(r) AS m "
+            + TREE_RECORD_RETURN)
+
+##================== Graph Version ======================
+
+def with_version_bump(*variables, where=None, **expressions):
+    """
+    Returns a Cypher fragment that bumps the database-side graph version marker.
+    `variables` are kept in scope as they are and each `name=expression` keyword is carried as
+    `expression AS name`; the caller appends a RETURN that can read them, `previous_version` and
+    `_v.version`. With `where`, the marker is only bumped (and a row only returned) when that
+    condition on the carried names holds.
+    """
+    names = [*variables, *expressions]
+    carry = ", ".join([*variables, *(f"{expression} AS {name}" for name, expression in expressions.items())])
+    return (f"WITH {carry} " + (f"WHERE {where} " if where else "") + f"MERGE (_v:{GRAPH_VERSION_MARKER}) "
+            f"WITH {', '.join(names)}, _v, _v.version AS previous_version "
+            "SET _v.version = CASE WHEN coalesce(_v.version, 0) < timestamp() THEN timestamp() ELSE _v.version + 1 END ")
+
+def fetch_graph_version(_driver):
+    """Reads the graph version marker, creating it if a reset or snapshot load removed it."""
+    records = read_query(_driver, f"MATCH (v:{GRAPH_VERSION_MARKER}) RETURN v.version AS version")
+    if records and records[0]['version'] is not None:
+        return records[0]['version']
+    records, _ = write_query(_driver, f"MERGE (v:{GRAPH_VERSION_MARKER}) "
+                                      "ON CREATE SET v.version = timestamp() RETURN v.version AS version")
+    return records[0]['version']
+
+def bump_graph_version(_driver):
+    """Moves the graph version marker for writes that do not report their own deltas."""
+    write_query(_driver, with_version_bump(bumped="1") + "RETURN _v.version AS version")
+
+##================== Search ======================
+
+def fulltext_query(text):
+    """
+    Turns free text into a Lucene query for the name index: every word must match and the
+    last one may be a prefix, so results narrow as the user types. Returns None for blank text.
+    """
+    terms = [LUCENE_SPECIAL_CHARACTERS.sub(r"\\\1", term) for term in text.lower().split()]
+    if not terms:
+        return None
+    return " AND ".join(terms[:-1] + [terms[-1] + "*"])
+
+def fetch_neighbourhood(_driver, node_id):
+    """Fetches the path from the tree's root down to a node, plus the node's direct children."""
+    return [tree_record(record) for record in read_query(
+        _driver,
+        "MATCH (target) WHERE elementId(target) = $node_id "
+        f"OPTIONAL MATCH path = (target)<-[:{TREE_REL_PATTERN}*]-(ancestor) WHERE NOT ()-[:{TREE_REL_PATTERN}]->(ancestor) "
+        f"OPTIONAL MATCH (target)-[child_rel:{TREE_REL_PATTERN}]->() "
+        "WITH coalesce(relationships(path), []) AS ancestor_rels, collect(child_rel) AS child_rels "
+        "UNWIND ancestor_rels + child_rels AS r "
+        "WITH startNode(r) AS n, r, endNode(r) AS m "
+        + TREE_RECORD_RETURN, node_id=node_id)]
+
+##================== Database Interaction Functions ======================
+
+def format_cypher_value(value):
+    """Formats a single Python value as a Cypher literal, escaping strings."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(format_cypher_value(v) for v in value) + "]"
+    if isinstance(value, dict):
+        return format_cypher_properties(value)
+    # Strings and any other types (like temporal values) are written as quoted strings
+    escaped_value = str(value).replace('\\', '\\\\').replace("'", "\\'")
+    return f"'{escaped_value}'"
+
+def format_cypher_properties(props):
+    """Formats a dictionary of properties into a Cypher map string, escaping values."""
+    # Use backticks for keys to handle special characters or keywords
+    items = [f"`{key}`: {format_cypher_value(value)}" for key, value in props.items()]
+    return "{" + ", ".join(items) + "}"
+
+def _write_legacy_snapshot(tx, f):
+    """Writes one CREATE per node and one property-matched CREATE per relationship."""
+    cypher_statements = ["MATCH (n) DETACH DELETE n;", "\n// --- Creating Nodes ---"]
+
+    # Fetch all nodes and generate CREATE statements
+    nodes_data = [record['n'] for record in tx.run(f"MATCH (n) WHERE NOT n:{GRAPH_VERSION_LABEL} "
+                                                   f"AND NOT n:{TOMBSTONE_LABEL} RETURN n")]
+    if not nodes_data:
+        return 0
+
+    for node in nodes_data:
+        labels = ":".join(node.labels)
+        props = format_cypher_properties(dict(node))
+        cypher_statements.append(f"CREATE (:{labels} {props});")
+
+    cypher_statements.append("\n// --- Creating Relationships ---")
+
+    # Fetch all relationships and generate CREATE statements
+    rels_result = tx.run("MATCH (n)-[r]->(m) RETURN n, r, m")
+    for record in rels_result:
+        source_node, rel, target_node = record['n'], record['r'], record['m']
+        source_match = f"(a:{':'.join(source_node.labels)} {format_cypher_properties(dict(source_node))})"
+        target_match = f"(b:{':'.join(target_node.labels)} {format_cypher_properties(dict(target_node))})"
+        rel_create = f"[:`{rel.type}` {format_cypher_properties(dict(rel))}]" if dict(rel) else f"[:`{rel.type}`]"
+        cypher_statements.append(f"MATCH {source_match}, {target_match} CREATE (a)-{rel_create}->(b);")
+
+    f.write('\n'.join(cypher_statements))
+    return len(nodes_data)
+
+def _write_batched_snapshot(tx, f, batch_size):
+    """
+    Streams nodes and relationships into UNWIND batches linked by a snapshot-local key.
+    Restoring the file costs one indexed lookup per relationship instead of a property-map scan.
+    """
+    key_by_element_id = {} # elementId -> snapshot-local key, the only per-node state kept in memory
+    pending = {} # label/type group -> list of row literals waiting to be written
+
+    def flush(group, statement):
+        rows = pending.pop(group, [])
+        if rows:
+            f.write(f"UNWIND [{', '.join(rows)}] AS row {statement};\n")
+
+    def node_statement(labels):
+        label_str = "".join(f":`{label}`" for label in labels)
+        return (f"CREATE (n{label_str}:{SNAPSHOT_KEY_LABEL}) "
+                f"SET n = row.props, n.{SNAPSHOT_KEY_PROPERTY} = row.key")
+
+    def rel_statement(rel_type):
+        return (f"MATCH (a:{SNAPSHOT_KEY_LABEL} {{{SNAPSHOT_KEY_PROPERTY}: row.a}}) "
+                f"MATCH (b:{SNAPSHOT_KEY_LABEL} {{{SNAPSHOT_KEY_PROPERTY}: row.b}}) "
+                f"CREATE (a)-[r:`{rel_type}`]->(b) SET r = row.props")
+
+    f.write(f"CREATE INDEX {SNAPSHOT_KEY_INDEX} IF NOT EXISTS "
+            f"FOR (n:{SNAPSHOT_KEY_LABEL}) ON (n.{SNAPSHOT_KEY_PROPERTY});\n")
+    f.write("CALL db.awaitIndexes();\n")
+    f.write("MATCH (n) DETACH DELETE n;\n")
+    f.write("\n// --- Creating Nodes ---\n")
+
+    # The result is consumed as a stream, so only one batch per label group is held at a time
+    nodes_result = tx.run(f"MATCH (n) WHERE NOT n:{GRAPH_VERSION_LABEL} AND NOT n:{TOMBSTONE_LABEL} "
+                          "RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props")
+    for record in nodes_result:
+        key = len(key_by_element_id)
+        key_by_element_id[record['id']] = key
+        group = tuple(sorted(record['labels']))
+        pending.setdefault(group, []).append(f"{{key: {key}, props: {format_cypher_properties(record['props'])}}}")
+        if len(pending[group]) >= batch_size:
+            flush(group, node_statement(group))
+    for group in list(pending):
+        flush(group, node_statement(group))
+
+    if not key_by_element_id:
+        return 0
+
+    f.write("\n// --- Creating Relationships ---\n")
+
+    rels_result = tx.run("MATCH (a)-[r]->(b) "
+                         "RETURN elementId(a) AS source, elementId(b) AS target, type(r) AS type, properties(r) AS props")
+    for record in rels_result:
+        rel_type = record['type']
+        row = (f"{{a: {key_by_element_id[record['source']]}, b: {key_by_element_id[record['target']]}, "
+               f"props: {format_cypher_properties(record['props'])}}}")
+        pending.setdefault(rel_type, []).append(row)
+        if len(pending[rel_type]) >= batch_size:
+            flush(rel_type, rel_statement(rel_type))
+    for rel_type in list(pending):
+        flush(rel_type, rel_statement(rel_type))
+
+    f.write("\n// --- Removing snapshot keys ---\n")
+    f.write(f"MATCH (n:{SNAPSHOT_KEY_LABEL}) REMOVE n:{SNAPSHOT_KEY_LABEL}, n.{SNAPSHOT_KEY_PROPERTY};\n")
+    f.write(f"DROP INDEX {SNAPSHOT_KEY_INDEX} IF EXISTS;\n")
+    return len(key_by_element_id)
+
+def create_database_snapshot(_driver, file_path, mode="batched", batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Queries the current database state and writes it to a .cql snapshot file.
+    mode="batched" streams UNWIND batches keyed by a snapshot-local id; mode="legacy" writes
+    one statement per node and per relationship.
+    """
+    if mode not in ("batched", "legacy"):
+        raise ValueError(f"Invalid snapshot mode: {mode}. Must be one of ['batched', 'legacy']")
+
+    def write_snapshot(tx, f):
+        # Both reads share one transaction, so nodes and relationships come from the same state.
+        # A retried transaction starts the file over.
+        f.seek(0)
+        f.truncate()
+        if mode == "batched":
+            return _write_batched_snapshot(tx, f, batch_size)
+        return _write_legacy_snapshot(tx, f)
+
+    try:
+        with open_session(_driver) as session, open(file_path, 'w', encoding='utf-8') as f:
+            node_count = session.execute_read(write_snapshot, f)
+
+            if node_count == 0:
+                f.seek(0)
+                f.truncate()
+                f.write("// Database is empty. No snapshot created.")
+                return True, "Snapshot created (database was empty)."
+        return True, f"Snapshot created at `{os.path.basename(file_path)}`"
+    except Exception as e:
+        return False, f"An error occurred during snapshot creation: {e}"
+
+def update_node_properties(_driver, node_id, new_properties, graph_cache=None):
+    """Updates properties for a specific node using its element ID."""
+    # Using SET n += $props is a convenient way to update properties from a dictionary.
+    # A rename leaves a tombstone so incremental snapshots can rename the node on restore.
+    records, _ = write_query(_driver, "MATCH (n) WHERE elementId(n) = $node_id "
+                                      f"WITH n, {key_label_expression('n')} AS key_label, "
+                                      "CASE WHEN n.name <> $props.name THEN n.name END AS old_name "
+                                      "SET n += $props, n.updated_at = timestamp() "
+                                      + tombstone_fragment("key_label", "old_name", renamed_to="n.name")
+                                      + with_version_bump("n")
+                                      + "RETURN properties(n) AS props, previous_version, _v.version AS version",
+                             node_id=node_id, props=new_properties)
+    if records and graph_cache is not None:
+        record = records[0]
+        graph_cache.apply_update(node_id, record['props'], record['previous_version'], record['version'])
+
+def delete_node(_driver, node_id, graph_cache=None):
+    """Deletes a node and its relationships using its element ID."""
+    # DETACH DELETE removes the node and all its relationships
+    records, _ = write_query(_driver, "MATCH (n) WHERE elementId(n) = $node_id "
+                                            f"WITH n, {key_label_expression('n')} AS key_label, n.name AS key_name "
+                                            "DETACH DELETE n "
+                                            + tombstone_fragment("key_label", "key_name")
+                                            + with_version_bump(deleted="count(n)", where="deleted > 0")
+                                            + "RETURN deleted, previous_version, _v.version AS version",
+                                   node_id=node_id)
+    if not records:
+        raise Exception("Node could not be deleted. It might have been removed already.")
+    if graph_cache is not None:
+        graph_cache.apply_delete([node_id], records[0]['previous_version'], records[0]['version'])
+
+def create_node_and_relationship(_driver, node_name, parent_node_name, relationship_type, graph_cache=None):
+    """
+    Creates a new node and a relationship to a parent node. The parent is looked up only among
+    the labels PARENT_LABELS_BY_REL allows for relationship_type.
+    """
+    if relationship_type not in REL_TO_LABEL_MAP:
+        raise ValueError(f"Invalid relationship type: {relationship_type}. Must be one of {list(REL_TO_LABEL_MAP.keys())}")
+
+    node_label = REL_TO_LABEL_MAP[relationship_type]
+    # Each branch is an index seek on the label's unique `name`, instead of a scan over every node
+    parent_lookup = " UNION ".join(f"MATCH (p:{label} {{name: $parent_node_name}}) RETURN p"
+                                   for label in PARENT_LABELS_BY_REL[relationship_type])
+
+    # This query finds the parent, creates the new node, and then the relationship.
+    # The node label and relationship type are validated above, so f-string is safe here.
+    query = (f"CALL {{ {parent_lookup} }} "
+             "WITH collect(p) AS parents WHERE size(parents) = 1 "
+             "WITH parents[0] AS p "
+             f"CREATE (n:{node_label} {{name: $node_name, status: 'Planning', "
+             "created_at: timestamp(), updated_at: timestamp()}) "
+             f"CREATE (p)-[:`{relationship_type}`]->(n) "
+             + with_version_bump("p", "n")
+             + "RETURN elementId(p) AS parent_id, elementId(n) AS id, labels(n) AS labels, "
+               "properties(n) AS props, previous_version, _v.version AS version")
+    records, summary = write_query(_driver, query, node_name=node_name, parent_node_name=parent_node_name)
+    if summary.counters.nodes_created == 0:
+        parent_count = read_query(_driver, f"CALL {{ {parent_lookup} }} RETURN count(p) AS parents",
+                                  parent_node_name=parent_node_name)[0]['parents']
+        allowed = " or ".join(PARENT_LABELS_BY_REL[relationship_type])
+        if parent_count > 1:
+            raise Exception(f"Could not create node. Parent name '{parent_node_name}' matches {parent_count} {allowed} nodes.")
+        raise Exception(f"Could not create node. No {allowed} node named '{parent_node_name}' exists.")
+    if graph_cache is not None:
+        record = records[0]
+        node = {"id": record['id'], "labels": record['labels'], "properties": record['props']}
+        graph_cache.apply_create(record['parent_id'], node, relationship_type,
+                                 record['previous_version'], record['version'])
+
+def set_subtree_status(_driver, node_ids, status, graph_cache=None):
+    """Sets `status` on every node in the subtrees rooted at node_ids, in one statement."""
+    if status not in TASK_STATUSES:
+        raise ValueError(f"Invalid status: {status}. Must be one of {TASK_STATUSES}")
+    records, _ = write_query(_driver, f"MATCH (root) WHERE elementId(root) IN $node_ids "
+                                      f"MATCH (root)-[:{TREE_REL_PATTERN}*0..]->(d) "
+                                      "WITH DISTINCT d SET d.status = $status, d.updated_at = timestamp() "
+                                      + with_version_bump(updated="collect(elementId(d))")
+                                      + "RETURN updated, previous_version, _v.version AS version",
+                             node_ids=list(node_ids), status=status)
+    record = records[0]
+    if graph_cache is not None:
+        graph_cache.apply_status(record['updated'], status, record['previous_version'], record['version'])
+    return len(record['updated'])
+
+def delete_subtrees(_driver, node_ids, graph_cache=None):
+    """Deletes the nodes in node_ids together with everything below them, in one statement."""
+    records, _ = write_query(_driver, f"MATCH (root) WHERE elementId(root) IN $node_ids "
+                                      f"MATCH (root)-[:{TREE_REL_PATTERN}*0..]->(d) "
+                                      "WITH DISTINCT d, elementId(d) AS deleted_id, "
+                                      f"{key_label_expression('d')} AS key_label, d.name AS key_name "
+                                      "DETACH DELETE d "
+                                      + tombstone_fragment("key_label", "key_name")
+                                      + with_version_bump(deleted="collect(deleted_id)", where="size(deleted) > 0")
+                                      + "RETURN deleted, previous_version, _v.version AS version",
+                             node_ids=list(node_ids))
+    if not records:
+        raise Exception("Nothing was deleted. The selected nodes might have been removed already.")
+    record = records[0]
+    if graph_cache is not None:
+        graph_cache.apply_delete(record['deleted'], record['previous_version'], record['version'])
+    return len(record['deleted'])
+
+def move_subtrees(_driver, node_ids, new_parent_name):
+    """
+    Re-parents the nodes in node_ids (and so their subtrees) under the node named new_parent_name,
+    in one statement. Each node keeps the type of its current parent relationship. Nodes the
+    new parent sits below are skipped, since moving them would create a cycle, and so are nodes
+    whose relationship type does not allow the new parent's label (see PARENT_LABELS_BY_REL).
+    A selected node below another selected node moves with that subtree and is not counted.
+    Returns (moved count, names of the nodes skipped for their type).
+    """
+    parent_lookup = " UNION ".join(f"MATCH (p:{label} {{name: $parent_name}}) RETURN p" for label in TODO_LABELS)
+    # Relationship types cannot be parameters, so one conditional CREATE per allowed type
+    create_edges = " ".join(f"FOREACH (_ IN CASE WHEN allowed AND rel_type = '{rel_type}' THEN [1] ELSE [] END | "
+                            f"CREATE (p)-[:`{rel_type}`]->(n))" for rel_type in TREE_RELATIONSHIPS)
+    default_type = " ".join(f"WHEN n:{label} THEN '{rel_type}'" for rel_type, label in REL_TO_LABEL_MAP.items())
+    records, _ = write_query(_driver, f"CALL {{ {parent_lookup} }} "
+                                      "WITH collect(p) AS parents WHERE size(parents) = 1 "
+                                      "WITH parents[0] AS p "
+                                      "MATCH (n) WHERE elementId(n) IN $node_ids AND NOT n:Start_Node "
+                                      f"AND NOT (n)-[:{TREE_REL_PATTERN}*0..]->(p) "
+                                      # A selected node below another selected node moves with it, not beside it
+                                      f"AND NOT EXISTS {{ MATCH (a)-[:{TREE_REL_PATTERN}*1..]->(n) WHERE elementId(a) IN $node_ids }} "
+                                      f"OPTIONAL MATCH ()-[old:{TREE_REL_PATTERN}]->(n) "
+                                      "WITH p, n, collect(old) AS old_rels "
+                                      "WITH p, n, old_rels, CASE WHEN size(old_rels) > 0 THEN type(old_rels[0]) "
+                                      f"ELSE CASE {default_type} ELSE 'HAS_TASK' END END AS rel_type "
+                                      "WITH p, n, old_rels, rel_type, "
+                                      "any(label IN labels(p) WHERE label IN $parent_labels[rel_type]) AS allowed "
+                                      "FOREACH (old IN CASE WHEN allowed THEN old_rels ELSE [] END | DELETE old) "
+                                      "FOREACH (_ IN CASE WHEN allowed THEN [1] ELSE [] END | SET n.updated_at = timestamp()) "
+                                      + create_edges + " "
+                                      + with_version_bump(moved="count(CASE WHEN allowed THEN n END)",
+                                                          rejected="collect(CASE WHEN NOT allowed THEN n.name END)")
+                                      + "RETURN moved, rejected",
+                             node_ids=list(node_ids), parent_name=new_parent_name, parent_labels=PARENT_LABELS_BY_REL)
+    moved, rejected = records[0]['moved'], records[0]['rejected']
+    if moved == 0 and not rejected:
+        parent_count = read_query(_driver, f"CALL {{ {parent_lookup} }} RETURN count(p) AS parents",
+                                  parent_name=new_parent_name)[0]['parents']
+        if parent_count != 1:
+            raise Exception(f"Could not move nodes. '{new_parent_name}' matches {parent_count} nodes, expected exactly one.")
+        raise Exception(f"Could not move nodes. '{new_parent_name}' is inside the selected subtrees.")
+    return moved, rejected
+
+def flush_edits(_driver, pending_edits, graph_cache=None):
+    """
+    Writes queued edits in one UNWIND transaction. An edit is applied only if every key it
+    touches still holds the value it had when first edited; otherwise (or if the node is gone)
+    it is skipped. Returns (applied node ids, {node id: conflicting keys}); the keys of a
+    deleted node are [DELETED_CONFLICT].
+    """
+    if not pending_edits:
+        return [], {}
+    edits = [{"id": node_id, "base": edit["base"], "props": edit["props"]} for node_id, edit in pending_edits.items()]
+    records, _ = write_query(_driver, "UNWIND $edits AS edit "
+                                      "OPTIONAL MATCH (n) WHERE elementId(n) = edit.id "
+                                      f"WITH edit, n, CASE WHEN n IS NULL THEN ['{DELETED_CONFLICT}'] ELSE "
+                                      "[key IN keys(edit.base) WHERE NOT coalesce(n[key] = edit.base[key], "
+                                      "n[key] IS NULL AND edit.base[key] IS NULL)] END AS conflicts "
+                                      f"WITH edit, n, conflicts, {key_label_expression('n')} AS key_label, "
+                                      "CASE WHEN size(conflicts) = 0 AND n.name <> edit.props.name THEN n.name END AS old_name "
+                                      "FOREACH (_ IN CASE WHEN size(conflicts) = 0 THEN [1] ELSE [] END | "
+                                      "SET n += edit.props, n.updated_at = timestamp()) "
+                                      + tombstone_fragment("key_label", "old_name", renamed_to="n.name")
+                                      + "WITH collect(CASE WHEN size(conflicts) = 0 THEN [edit.id, properties(n)] END) AS applied, "
+                                      "collect(CASE WHEN size(conflicts) > 0 THEN [edit.id, conflicts] END) AS rejected "
+                                      + with_version_bump("applied", "rejected")
+                                      + "RETURN applied, rejected, previous_version, _v.version AS version",
+                             edits=edits)
+    record = records[0]
+    applied = dict(record['applied'])
+    if graph_cache is not None and applied:
+        graph_cache.apply_updates(applied, record['previous_version'], record['version'])
+    return list(applied), dict(record['rejected'])
+
+##================== Compact Snapshots ======================
+
+def key_label_expression(variable):
+    """Cypher expression for the label half of a node's snapshot key: its first label in TODO_LABELS."""
+    labels = ", ".join(f"'{label}'" for label in TODO_LABELS)
+    return f"head([label IN [{labels}] WHERE label IN labels({variable})])"
+
+def tombstone_fragment(label_var, name_var, renamed_to=None):
+    """
+    Cypher fragment recording that the node keyed (label_var, name_var) was deleted, or renamed
+    to the `renamed_to` expression. Does nothing when either half of the key is null.
+    """
+    return (f"FOREACH (_ IN CASE WHEN {label_var} IS NULL OR {name_var} IS NULL THEN [] ELSE [1] END | "
+            f"MERGE (t:{TOMBSTONE_LABEL} {{label: {label_var}, name: {name_var}}}) "
+            f"SET t.deleted_at = timestamp(), t.renamed_to = {renamed_to or 'null'}) ")
+
+def node_key(labels, props):
+    """[label, name] identifying a todo node across snapshots, or None for nodes that cannot be keyed."""
+    label = next((label for label in TODO_LABELS if label in labels), None)
+    name = props.get('name')
+    if label is None or name is None:
+        return None
+    return [label, name]
+
+def cypher_name(name):
+    """Backtick-quotes a label or relationship type read from a snapshot file."""
+    return "`" + name.replace("`", "``") + "`"
+
+def _read_full_graph(tx, emit):
+    """Emits every keyed node, then every relationship between keyed nodes. Returns the nodes skipped."""
+    keys = {} # elementId -> node key, so relationships can be written by key
+    skipped = 0
+    nodes_result = tx.run(f"MATCH (n) WHERE NOT n:{GRAPH_VERSION_LABEL} AND NOT n:{TOMBSTONE_LABEL} "
+                          "RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props")
+    for record in nodes_result:
+        key = node_key(record['labels'], record['props'])
+        if key is None:
+            skipped += 1
+            continue
+        keys[record['id']] = key
+        emit({"type": "node", "key": key, "labels": record['labels'], "props": record['props']})
+
+    rels_result = tx.run("MATCH (a)-[r]->(b) "
+                         "RETURN elementId(a) AS source, elementId(b) AS target, type(r) AS type, properties(r) AS props")
+    for record in rels_result:
+        if record['source'] in keys and record['target'] in keys:
+            emit({"type": "edge", "rel": record['type'], "from": keys[record['source']],
+                  "to": keys[record['target']], "props": record['props']})
+    return skipped
+
+def _read_graph_changes(tx, emit, since):
+    """
+    Emits tombstones, then nodes created or updated since `since`, then every relationship
+    into those nodes. Returns the nodes skipped.
+    """
+    tombstones = tx.run(f"MATCH (t:{TOMBSTONE_LABEL}) WHERE t.deleted_at >= $since "
+                        "RETURN t.label AS label, t.name AS name, t.renamed_to AS renamed_to "
+                        "ORDER BY t.deleted_at", since=since)
+    for record in tombstones:
+        emit({"type": "tombstone", "key": [record['label'], record['name']], "renamed_to": record['renamed_to']})
+
+    changed = {} # elementId -> node key
+    skipped = 0
+    for label in TODO_LABELS:
+        nodes_result = tx.run(f"MATCH (n:{label}) WHERE n.updated_at >= $since "
+                              "RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props", since=since)
+        for record in nodes_result:
+            key = node_key(record['labels'], record['props'])
+            if key is None:
+                skipped += 1
+            elif record['id'] not in changed:
+                changed[record['id']] = key
+                emit({"type": "node", "key": key, "labels": record['labels'], "props": record['props']})
+
+    changed_ids = list(changed)
+    for start in range(0, len(changed_ids), SNAPSHOT_BATCH_SIZE):
+        rels_result = tx.run("MATCH (a)-[r]->(b) WHERE elementId(b) IN $ids "
+                             "RETURN labels(a) AS source_labels, a.name AS source_name, elementId(b) AS target, "
+                             "type(r) AS type, properties(r) AS props",
+                             ids=changed_ids[start:start + SNAPSHOT_BATCH_SIZE])
+        for record in rels_result:
+            source_key = node_key(record['source_labels'], {"name": record['source_name']})
+            if source_key is not None:
+                emit({"type": "edge", "rel": record['type'], "from": source_key,
+                      "to": changed[record['target']], "props": record['props']})
+    return skipped
+
+def read_snapshot_header(path):
+    """Returns the header of a compact snapshot file, with its `path` added."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+    if header.get("type") != "header" or header.get("format") != COMPACT_SNAPSHOT_FORMAT:
+        raise ValueError(f"{os.path.basename(path)} is not a compact todo snapshot.")
+    if header.get("format_version", 0) > COMPACT_SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"{os.path.basename(path)} was written by a newer version of the app.")
+    header["path"] = path
+    return header
+
+def snapshot_chain(snapshot_dir):
+    """
+    Headers of the newest full snapshot in snapshot_dir and of the incremental snapshots built
+    on it, oldest first. The chain stops at the first incremental whose base is missing.
+    """
+    if not os.path.isdir(snapshot_dir):
+        return []
+    headers = []
+    for file_name in os.listdir(snapshot_dir):
+        if file_name.startswith("todo_snapshot_") and file_name.endswith(".jsonl.gz"):
+            try:
+                headers.append(read_snapshot_header(os.path.join(snapshot_dir, file_name)))
+            except (OSError, ValueError):
+                continue # Not a snapshot, or unreadable; a restore cannot use it either
+    headers.sort(key=lambda header: header["taken_at"])
+    full_indexes = [index for index, header in enumerate(headers) if header["kind"] == "full"]
+    if not full_indexes:
+        return []
+    chain = [headers[full_indexes[-1]]]
+    for header in headers[full_indexes[-1] + 1:]:
+        if header["kind"] == "incremental" and header["base"] == os.path.basename(chain[-1]["path"]):
+            chain.append(header)
+    return chain
+
+def read_compact_snapshot(path):
+    """
+    Yields the records of a compact snapshot after its header, as a stream.
+    Raises ValueError once the end is reached if the checksum trailer is missing or does not match.
+    """
+    digest = hashlib.sha256()
+    trailer = None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header_line = f.readline()
+        digest.update(header_line.encode('utf-8'))
+        for line in f:
+            record = json.loads(line)
+            if record.get("type") == "checksum":
+                trailer = record
+                break
+            digest.update(line.encode('utf-8'))
+            yield record
+    if trailer is None or trailer.get("sha256") != digest.hexdigest():
+        raise ValueError(f"{os.path.basename(path)} failed its checksum; the file is truncated or corrupted.")
+
+def create_compact_snapshot(_driver, snapshot_dir=COMPACT_SNAPSHOT_DIR, incremental=False, progress_callback=None):
+    """
+    Streams the graph into a gzip-compressed JSON lines file in snapshot_dir: a header,
+    tombstone / node / edge records keyed by (label, name), and a sha256 checksum trailer.
+    An incremental snapshot records only the changes since the newest snapshot in the
+    directory; it falls back to a full one when there is none, or when the graph has been
+    reset since (the version marker's epoch moved).
+    progress_callback(records written, None) is called every SNAPSHOT_PROGRESS_INTERVAL records,
+    as the total is not known until the end.
+    """
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        # The epoch is set when the version marker is created, and a reset or load deletes the marker
+        marker, _ = write_query(_driver, f"MERGE (v:{GRAPH_VERSION_MARKER}) ON CREATE SET v.version = timestamp() "
+                                         "SET v.epoch = coalesce(v.epoch, timestamp()) "
+                                         "RETURN v.epoch AS epoch, timestamp() AS now")
+        epoch, taken_at = marker[0]['epoch'], marker[0]['now']
+        chain = snapshot_chain(snapshot_dir)
+        base = chain[-1] if chain else None
+        fell_back = incremental and (base is None or base.get("epoch") != epoch)
+        if fell_back:
+            incremental = False
+        kind = "incremental" if incremental else "full"
+        header = {"type": "header", "format": COMPACT_SNAPSHOT_FORMAT,
+                  "format_version": COMPACT_SNAPSHOT_FORMAT_VERSION, "kind": kind, "epoch": epoch,
+                  "taken_at": taken_at,
+                  "since": base["taken_at"] - INCREMENTAL_OVERLAP_MS if incremental else None,
+                  "base": os.path.basename(base["path"]) if incremental else None}
+        file_name = f"todo_snapshot_{taken_at}_{kind}.jsonl.gz"
+        path = os.path.join(snapshot_dir, file_name)
+        temp_path = path + ".tmp"
+
+        def write_snapshot(tx):
+            # Reopening the file on every attempt keeps a retried transaction from appending twice
+            digest = hashlib.sha256()
+            counts = {"tombstone": 0, "node": 0, "edge": 0}
+            with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+                def emit(record):
+                    line = json.dumps(record, default=str, separators=(",", ":")) + "\n"
+                    digest.update(line.encode('utf-8'))
+                    f.write(line)
+                    if record["type"] in counts:
+                        counts[record["type"]] += 1
+                        written = sum(counts.values())
+                        if progress_callback and written % SNAPSHOT_PROGRESS_INTERVAL == 0:
+                            progress_callback(written, None)
+
+                emit(header)
+                if incremental:
+                    skipped = _read_graph_changes(tx, emit, header["since"])
+                else:
+                    skipped = _read_full_graph(tx, emit)
+                f.write(json.dumps({"type": "checksum", "sha256": digest.hexdigest(), **counts}) + "\n")
+            return counts, skipped
+
+        with open_session(_driver) as session:
+            counts, skipped = session.execute_read(write_snapshot)
+        os.replace(temp_path, path)
+        if not incremental:
+            # A full snapshot already reflects these deletes, so later increments do not need them
+            write_query(_driver, f"MATCH (t:{TOMBSTONE_LABEL}) WHERE t.deleted_at < $since DELETE t",
+                        since=taken_at - INCREMENTAL_OVERLAP_MS)
+        message = (f"{kind.capitalize()} snapshot `{file_name}` created ({counts['node']} nodes, "
+                   f"{counts['edge']} relationships, {counts['tombstone']} deletes or renames).")
+        if fell_back:
+            message += " No earlier snapshot of this graph was found, so a full snapshot was taken."
+        if skipped:
+            message += f" {skipped} nodes without a todo label or name were skipped."
+        return True, message
+    except Exception as e:
+        return False, f"An error occurred during snapshot creation: {e}"
+
+def _restore_snapshot_file(tx, header, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Replays one compact snapshot file inside `tx`, batching rows per label and relationship type."""
+    incremental = header["kind"] == "incremental"
+    if not incremental:
+        tx.run("MATCH (n) DETACH DELETE n").consume()
+
+    pending = {} # statement -> rows waiting to be written
+    def flush(statement=None):
+        for query in [statement] if statement else list(pending):
+            rows = pending.pop(query, [])
+            if rows:
+                tx.run(query, rows=rows).consume()
+
+    def add(query, row, ordered=False):
+        if ordered and query not in pending:
+            # Tombstones must be applied in the order they were recorded
+            flush()
+        pending.setdefault(query, []).append(row)
+        if len(pending[query]) >= batch_size:
+            flush(query)
+
+    phase = None
+    for record in read_compact_snapshot(header["path"]):
+        if record["type"] != phase:
+            flush() # Nodes must exist before the relationships that use them
+            phase = record["type"]
+        label, name = record.get("key") or (None, None)
+        if record["type"] == "tombstone":
+            if record.get("renamed_to") is not None:
+                rename = f"UNWIND $rows AS row MATCH (n:{cypher_name(label)} {{name: row.name}}) SET n.name = row.renamed_to"
+                add(rename, {"name": name, "renamed_to": record["renamed_to"]}, ordered=True)
+                # In one UNWIND a rename would not see the name the previous row set, so X→Y, Y→Z would stop at Y
+                flush(rename)
+            else:
+                add(f"UNWIND $rows AS row MATCH (n:{cypher_name(label)} {{name: row.name}}) DETACH DELETE n",
+                    {"name": name}, ordered=True)
+        elif record["type"] == "node":
+            extra_labels = "".join(f":{cypher_name(extra)}" for extra in sorted(record["labels"]) if extra != label)
+            if incremental:
+                # The node's incoming relationships are all in this file, so the old ones are replaced
+                query = (f"UNWIND $rows AS row MERGE (n:{cypher_name(label)} {{name: row.name}}) SET n = row.props "
+                         + (f"SET n{extra_labels} " if extra_labels else "")
+                         + "WITH n OPTIONAL MATCH ()-[old]->(n) DELETE old")
+            else:
+                query = f"UNWIND $rows AS row CREATE (n:{cypher_name(label)}{extra_labels}) SET n = row.props"
+            add(query, {"name": name, "props": record["props"]})
+        elif record["type"] == "edge":
+            (from_label, from_name), (to_label, to_name) = record["from"], record["to"]
+            add(f"UNWIND $rows AS row MATCH (a:{cypher_name(from_label)} {{name: row.source}}) "
+                f"MATCH (b:{cypher_name(to_label)} {{name: row.target}}) "
+                f"CREATE (a)-[r:{cypher_name(record['rel'])}]->(b) SET r = row.props",
+                {"source": from_name, "target": to_name, "props": record["props"]})
+    flush()
+
+def restore_compact_snapshot(_driver, snapshot_dir=COMPACT_SNAPSHOT_DIR, progress_callback=None,
+                             batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Restores the newest full compact snapshot and replays the incremental snapshots taken
+    after it, in one managed write transaction. Files are streamed and each checksum is
+    checked before the transaction commits, so a damaged file leaves the database as it was.
+    progress_callback(done, total) is called after each file.
+    """
+    chain = snapshot_chain(snapshot_dir)
+    if not chain:
+        return False, f"No compact snapshot found in `{os.path.basename(snapshot_dir)}`."
+
+    def restore(tx):
+        for done, header in enumerate(chain, start=1):
+            _restore_snapshot_file(tx, header, batch_size)
+            if progress_callback:
+                progress_callback(done, len(chain))
+
+    try:
+        with open_session(_driver) as session:
+            session.execute_write(restore)
+    except Exception as e:
+        return False, f"An error occurred while restoring the snapshot, no changes were made: {e}"
+    message = (f"Restored `{os.path.basename(chain[0]['path'])}` "
+               f"and {len(chain) - 1} incremental snapshot(s) taken after it.")
+    try:
+        # Recreating the version marker the restore deleted tells every session to reload
+        bump_graph_version(_driver)
+    except Exception as e:
+        message += f" The graph version could not be moved: {e}"
+    return True, message
+
+##================== Bulk Import ======================
+
+def read_import_chunks(source, file_format=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Yields DataFrame chunks from a CSV, JSON (array of objects) or JSONL file.
+    `source` is a path or a file-like object with a `name` (such as a Streamlit upload).
+    """
+    if file_format is None:
+        file_format = os.path.splitext(getattr(source, 'name', str(source)))[1].lstrip('.').lower()
+    if file_format == "csv":
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    elif file_format == "jsonl":
+        yield from pd.read_json(source, lines=True, chunksize=chunk_size, dtype=False)
+    elif file_format == "json":
+        # A JSON array cannot be streamed, so it is parsed once and sliced
+        frame = pd.read_json(source, dtype=False)
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}. Must be one of ['csv', 'json', 'jsonl']")
+
+def _validate_import_row(row_number, row, seen_names):
+    """Returns (row dict, None) for a valid row, or (None, reason) explaining why it is rejected."""
+    def text(column):
+        value = row.get(column)
+        return "" if value is None or (isinstance(value, float) and value != value) else str(value).strip()
+
+    name, parent, relationship_type = text('name'), text('parent'), text('relationship_type')
+    status = text('status') or "Planning"
+    if not name or not parent:
+        return None, "name and parent are required"
+    if relationship_type not in REL_TO_LABEL_MAP:
+        return None, f"invalid relationship_type '{relationship_type}', must be one of {list(REL_TO_LABEL_MAP.keys())}"
+    if status not in TASK_STATUSES:
+        return None, f"invalid status '{status}', must be one of {TASK_STATUSES}"
+    key = (REL_TO_LABEL_MAP[relationship_type], name)
+    if key in seen_names:
+        return None, f"duplicate {key[0]} name '{name}' (first seen in row {seen_names[key]})"
+    seen_names[key] = row_number
+    return {"row": row_number, "name": name, "parent": parent, "status": status,
+            "relationship_type": relationship_type}, None
+
+def _import_query(relationship_type):
+    """UNWIND query creating one relationship type's rows under index-backed, labelled parents."""
+    node_label = REL_TO_LABEL_MAP[relationship_type]
+    parent_lookup = " UNION ".join(f"WITH row MATCH (p:{label} {{name: row.parent}}) RETURN p"
+                                   for label in PARENT_LABELS_BY_REL[relationship_type])
+    return (f"UNWIND $rows AS row "
+            f"CALL {{ {parent_lookup} }} "
+            "WITH row, collect(p) AS parents WHERE size(parents) = 1 "
+            "WITH row, parents[0] AS p "
+            f"CREATE (n:{node_label} {{name: row.name, status: row.status, "
+            "created_at: timestamp(), updated_at: timestamp()}) "
+            f"CREATE (p)-[:`{relationship_type}`]->(n) "
+            "RETURN row.row AS row")
+
+def _write_import_batch(_driver, query, batch):
+    """Writes one UNWIND batch as a managed transaction. Returns (row numbers written, failures)."""
+    failures = []
+    with open_session(_driver) as session:
+        try:
+            written = {record['row'] for record in session.execute_write(_fetch_all, query, {"rows": batch})[0]}
+        except Exception:
+            # One bad row (e.g. a name already in the database) fails the whole batch,
+            # so fall back to row-by-row writes to pin the error on the right rows
+            written = set()
+            for row in batch:
+                try:
+                    written.update(record['row'] for record in session.execute_write(_fetch_all, query, {"rows": [row]})[0])
+                except Exception as e:
+                    failures.append((row['row'], row['name'], str(e)))
+    return written, failures
+
+def _write_import_rows(_driver, rows, failures, batch_size=None, workers=1):
+    """
+    Writes rows grouped by relationship type, one managed UNWIND transaction per batch of
+    batch_size rows (per group when None), on up to `workers` threads at once.
+    Returns (created count, rows whose parent was not found yet).
+    """
+    batches = []
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['relationship_type'], []).append(row)
+    for relationship_type, group in groups.items():
+        query = _import_query(relationship_type)
+        size = batch_size or len(group)
+        batches.extend((query, group[start:start + size]) for start in range(0, len(group), size))
+    if workers > 1 and len(batches) > 1:
+        # A row whose parent is in a batch still being written comes back unresolved and is retried
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda batch: _write_import_batch(_driver, *batch), batches))
+    else:
+        results = [_write_import_batch(_driver, *batch) for batch in batches]
+
+    created = 0
+    unresolved = []
+    for (_, batch), (written, batch_failures) in zip(batches, results):
+        failures.extend(batch_failures)
+        failed = {failure[0] for failure in batch_failures}
+        created += len(written)
+        unresolved.extend(row for row in batch if row['row'] not in written and row['row'] not in failed)
+    return created, unresolved
+
+def import_tasks(_driver, source, file_format=None, chunk_size=IMPORT_CHUNK_SIZE, progress_callback=None,
+                 batch_size=None, workers=1):
+    """
+    Bulk-creates nodes from a CSV/JSON/JSONL file of (name, parent, relationship_type, status) rows.
+    Rows are validated against REL_TO_LABEL_MAP and written in batched UNWIND transactions of
+    batch_size rows (a chunk per relationship type when None), on `workers` threads;
+    rows whose parent appears later in the file are retried once it exists.
+    Returns (created count, [(row number, name, reason), ...] for rows that were not imported).
+    progress_callback(rows read, created) is called after every chunk.
+    """
+    failures = []
+    seen_names = {}
+    deferred = []
+    created = 0
+    rows_read = 0
+    for chunk in read_import_chunks(source, file_format, chunk_size):
+        rows = []
+        for index, row in zip(chunk.index, chunk.to_dict('records')):
+            valid_row, reason = _validate_import_row(int(index) + 1, row, seen_names)
+            if valid_row is None:
+                failures.append((int(index) + 1, row.get('name'), reason))
+            else:
+                rows.append(valid_row)
+        rows_read += len(chunk)
+        chunk_created, unresolved = _write_import_rows(_driver, deferred + rows, failures, batch_size, workers)
+        created += chunk_created
+        deferred = unresolved
+        if progress_callback:
+            progress_callback(rows_read, created)
+
+    # Keep retrying rows whose parents were created later in the file, until nothing moves
+    while deferred:
+        retry_created, deferred_after = _write_import_rows(_driver, deferred, failures, batch_size, workers)
+        created += retry_created
+        if len(deferred_after) == len(deferred):
+            break
+        deferred = deferred_after
+    failures.extend((row['row'], row['name'], f"parent '{row['parent']}' not found, or matches more than one node")
+                    for row in deferred)
+    if created:
+        bump_graph_version(_driver)
+    return created, sorted(failures, key=lambda failure: failure[0])